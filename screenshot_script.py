@@ -1,6 +1,5 @@
-from tqdm import tqdm
 import pickle
-from stock_chart_cnn import ChartImage
+from stock_chart_cnn import ChartImage, ParallelGenerator
 from PIL import Image
 import numpy as np
 import io
@@ -41,9 +40,9 @@ def running():
     """
     Function to generate chart images for crypto tickers and time intervals.
     
-    This function reads in the arrays for tickers and time intervals, and then iterates over each ticker and time interval
-    combination to generate chart images using the specified parameters. The generated images are saved in the specified
-    directory.
+    This function reads in the arrays for tickers and time intervals, and then splits each ticker and time interval
+    combination into batches that are rendered in parallel using the specified parameters. The generated images are
+    saved in the specified directory.
     """
     # presets for running
     chart_type = 'candle'
@@ -53,6 +52,16 @@ def running():
     num_bar_gen = 5
     chart_width = 250
     chart_height = 250
+    # None uses every core
+    processes = None
+    # larger bartimes derived from each series and rendered aligned with its frames, ex: ['4_hour']
+    timeframes = None
+    # directory of the cProfile stats of one job in ten, None skips profiling
+    profile_dir = None
+    # directory the frames and labels are packed into tar shards in, None saves one file per frame
+    shard_dir = None
+    # encode and write the frame files on background threads, ex: {'format': 'JPEG', 'quality': 90}
+    writer_kwargs = None
     
     # read in the arrays for tickers
     crypto_tickers = pickle.load(open('data/crypto/iterables/coinbase_tickers.pkl', 'rb'))
@@ -62,17 +71,18 @@ def running():
     crypto_tickers = ['btcusd', 'ethusd']
     time_intervals = ['1_hour', '4_hour']
     
-    for ticker in tqdm(crypto_tickers, desc='Crypto: '):
-        for bartime in tqdm(time_intervals, desc='Bartime: '):
-            filename = 'data/crypto/formatted/{t}/{t}_{b}_data_formatted.csv'.format(t=ticker, b=bartime)
-            
-            chart_image_gen = ChartImage(filename=filename, ticker=ticker, bartime=bartime, 
-                                         chart_type=chart_type, parentdir=parentdir,
-                                         barspacing=barspacing, num_bars_show=num_bars_show,
-                                         num_bar_gen=num_bar_gen, chart_width=chart_width, 
-                                         chart_height=chart_height)
-            # save the generated images
-            chart_image_gen.batch_screenshot(batch_size=10_000)
+    chart_kwargs = {'chart_type': chart_type, 'parentdir': parentdir, 'barspacing': barspacing,
+                    'num_bars_show': num_bars_show, 'num_bar_gen': num_bar_gen,
+                    'chart_width': chart_width, 'chart_height': chart_height}
+    # shard the (ticker, bartime, batch) jobs across the worker processes
+    generator = ParallelGenerator(crypto_tickers, time_intervals, chart_kwargs,
+                                  processes=processes, batch_size=10_000, timeframes=timeframes,
+                                  profile_dir=profile_dir, shard_dir=shard_dir,
+                                  writer_kwargs=writer_kwargs)
+    # save the generated images, finished jobs are skipped when resuming
+    generator.run()
+    # time spent in each stage, the per job timings are in inputs/generation_metrics.jsonl
+    print(generator.metrics.timings())
 
 def main():
     #testing()
@@ -0,0 +1,173 @@
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+import pandas as pd
+from stock_chart_cnn import CandleStore, ChartImage, CoinbaseWrapper
+from stock_chart_cnn.stub_server import StubCoinbaseServer
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of the process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports KB, macOS reports bytes
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+@contextmanager
+def scratch_dir():
+    """
+    Runs the block inside a temporary working directory, so generated images are thrown away.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield Path(tmp)
+        finally:
+            os.chdir(cwd)
+
+def result(name: str, seconds: float, frames=None, rows=None, **extra):
+    """
+    Creates the record of one benchmark.
+
+    Args:
+        name (str): The name of the benchmark.
+        seconds (float): The wall clock time.
+        frames (int, optional): The number of frames produced.
+        rows (int, optional): The number of rows processed.
+        **extra: Other values to record, ex: per stage timings.
+
+    Returns:
+        dict: The benchmark record.
+    """
+    record = {'name': name, 'seconds': seconds, 'peak_rss_mb': peak_rss_mb()}
+    if frames is not None:
+        record.update(frames=frames, frames_per_sec=frames / seconds)
+    if rows is not None:
+        record.update(rows=rows, rows_per_sec=rows / seconds)
+    record.update(extra)
+    print('{n}: {s:.3f}s {e}'.format(n=name, s=seconds, e={k: v for k, v in record.items()
+                                                             if k.endswith('per_sec')}))
+    return record
+
+def bench_create_chart_images(filename: str, backend: str, num_rows: int, chart_kwargs: dict):
+    """
+    Measures ChartImage.create_chart_images on the first rows of a series.
+    """
+    chart_image_gen = ChartImage(filename=filename, ticker='btcusd', bartime='1_hour', backend=backend,
+                                 **chart_kwargs)
+    with scratch_dir():
+        start = time.perf_counter()
+        frames = chart_image_gen.create_chart_images(chart_image_gen._df.iloc[:num_rows], csv_step=False,
+                                                     image_id=0)
+        seconds = time.perf_counter() - start
+    stages = chart_image_gen.session.report()
+    chart_image_gen.close()
+    return result(f'create_chart_images[{backend}]', seconds, frames=frames, rows=num_rows, stages=stages)
+
+def bench_batch_screenshot(filename: str, backend: str, batch_size: int, chart_kwargs: dict):
+    """
+    Measures ChartImage.batch_screenshot over a whole series.
+    """
+    chart_image_gen = ChartImage(filename=filename, ticker='btcusd', bartime='4_hour', backend=backend,
+                                 **chart_kwargs)
+    with scratch_dir() as tmp:
+        start = time.perf_counter()
+        chart_image_gen.batch_screenshot(batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        frames = sum(len(files) for _, _, files in os.walk(tmp / 'inputs'))
+    return result(f'batch_screenshot[{backend}]', seconds, frames=frames, rows=len(chart_image_gen._df),
+                  stages=chart_image_gen.session.report())
+
+def bench_convert_4hour(filename: str):
+    """
+    Measures CoinbaseWrapper._convert_4hour_data on the 300 candle pages the API returns.
+    """
+    data = pd.read_csv(filename).set_index('date')
+    pages = [data.iloc[i:i + 300] for i in range(0, len(data), 300)]
+    start = time.perf_counter()
+    for page in pages:
+        CoinbaseWrapper._convert_4hour_data(page.iloc[::-1].copy())
+    return result('convert_4hour_data', time.perf_counter() - start, rows=len(data))
+
+def bench_read(filename: str):
+    """
+    Measures loading a series from the formatted csv and from the columnar store.
+    """
+    records = []
+    start = time.perf_counter()
+    data = ChartImage.read_csv(filename)
+    records.append(result('read_csv[csv]', time.perf_counter() - start, rows=len(data)))
+    with scratch_dir():
+        store = CandleStore('store')
+        store.from_csv(filename, 'btcusd', '1_hour')
+        start = time.perf_counter()
+        data = ChartImage.read_csv(str(store.series_dir('btcusd', '1_hour')))
+        records.append(result('read_csv[store]', time.perf_counter() - start, rows=len(data)))
+    return records
+
+def bench_fetch(ticker: str, bartime: str, start: int, end: int, workers: int, latency: float):
+    """
+    Measures CoinbaseWrapper.get_data_in_date_range against the local stub server.
+    """
+    with StubCoinbaseServer(latency=latency) as server:
+        coinbase = CoinbaseWrapper(base_url=server.url, requests_per_second=1000)
+        begin = time.perf_counter()
+        data = coinbase.get_data_in_date_range(ticker, bartime, start, end, workers=workers)
+        seconds = time.perf_counter() - begin
+        return result(f'get_data_in_date_range[{bartime},workers={workers}]', seconds, rows=len(data),
+                      requests=server.requests)
+
+def running():
+    """
+    Function to benchmark the chart generation and data ingestion hot paths.
+
+    This function runs every benchmark offline on the bundled formatted csv files and a stub Coinbase
+    server, prints the throughput of each and saves all results with the machine details as JSON.
+    """
+    # presets for running
+    filename_1h = 'data/crypto/formatted/btcusd/btcusd_1_hour_data_formatted.csv'
+    filename_4h = 'data/crypto/formatted/btcusd/btcusd_4_hour_data_formatted.csv'
+    chart_kwargs = {'chart_type': 'candle', 'parentdir': 'crypto', 'barspacing': 1.5,
+                    'num_bars_show': 60, 'num_bar_gen': 5, 'chart_width': 250, 'chart_height': 250}
+    # the lightweight backend needs a display, add it when one is available
+    backends = ['numpy']
+    num_rows = 5_000
+    #2018-01-01 in timestamp UTC
+    start = 1514764800
+    # 2024-03-01 in timestamp UTC
+    end = 1709251200
+    # simulated network round trip of the stub server
+    latency = 0.02
+    output = 'bench_output.json'
+
+    filename_1h = os.path.abspath(filename_1h)
+    filename_4h = os.path.abspath(filename_4h)
+    results = []
+    for backend in backends:
+        results.append(bench_create_chart_images(filename_1h, backend, num_rows, chart_kwargs))
+        results.append(bench_batch_screenshot(filename_4h, backend, 10_000, chart_kwargs))
+    results.append(bench_convert_4hour(filename_1h))
+    results.extend(bench_read(filename_1h))
+    for workers in [1, 8]:
+        results.append(bench_fetch('btcusd', '1_hour', start, end, workers, latency))
+
+    report = {'timestamp': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'results': results}
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Saved results to {output}')
+
+def main():
+    running()
+
+# run script
+if __name__ == '__main__':
+    main()
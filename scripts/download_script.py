@@ -1,6 +1,6 @@
 from tqdm import tqdm
 import pickle
-from stock_chart_cnn import CoinbaseWrapper
+from stock_chart_cnn import CoinbaseWrapper, ResponseCache
 
 def testing():
     """
@@ -35,6 +35,8 @@ def running():
     """
     # presets for running
     parentdir = 'crypto'
+    # number of requests made concurrently
+    workers = 8
     
     # read in the arrays for tickers
     crypto_tickers = pickle.load(open(f'data/{parentdir}/iterables/coinbase_tickers.pkl', 'rb'))
@@ -58,11 +60,64 @@ def running():
     
     for ticker in tqdm(crypto_tickers, desc='Crypto: '):
         for bartime in tqdm(time_intervals, desc='Bartime: '):
-            data = coinbase.get_data_in_date_range(ticker, bartime, start, end, save=True)
-            print(data)
+            # only fetches the candles after the stored csv, repair refetches the holes inside it
+            added = coinbase.sync(ticker, bartime, start=start, end=end, workers=workers)
+            print(f'{ticker} {bartime}: added {added} candles')
+
+def bulk_download():
+    """
+    Function to download every crypto ticker and time interval in one run.
+
+    This function schedules the requests of all ticker and time interval combinations on one pool of threads and
+    keeps the raw responses in a local cache, so an interrupted download picks up where it stopped when run again.
+    """
+    # presets for running
+    parentdir = 'crypto'
+    # number of requests made concurrently
+    workers = 8
+    
+    # read in the arrays for tickers
+    crypto_tickers = pickle.load(open(f'data/{parentdir}/iterables/coinbase_tickers.pkl', 'rb'))
+    time_intervals = pickle.load(open(f'data/{parentdir}/iterables/time_intervals.pkl', 'rb'))
+    
+    coinbase = CoinbaseWrapper(cache=ResponseCache(f'data/{parentdir}/cache'))
+    
+    #2018-01-01 in timestamp UTC
+    start = 1514764800
+    # 2024-03-01 in timestamp UTC
+    end = 1709251200
+    
+    saved = coinbase.download_all(crypto_tickers, time_intervals, start, end, workers=workers)
+    for (ticker, bartime), rows in saved.items():
+        print(f'{ticker} {bartime}: saved {rows} candles')
+
+def repair():
+    """
+    Function to validate and repair the stored crypto series.
+
+    This function checks every stored ticker and time interval for duplicated, out of order and invalid candles and
+    missing intervals, fixes them in place and refetches the missing intervals, then prints what is left.
+    """
+    # presets for running
+    # number of requests made concurrently
+    workers = 8
+    # 'ffill' fills the intervals coinbase has no candles for with flagged flat candles, None keeps the gaps
+    fill = None
+
+    crypto_tickers = ['btcusd', 'ethusd']
+    time_intervals = ['1_hour', '4_hour']
+
+    coinbase = CoinbaseWrapper()
+    for ticker in crypto_tickers:
+        for bartime in time_intervals:
+            before, after = coinbase.repair(ticker, bartime, fill=fill, workers=workers)
+            print(f'{ticker} {bartime}: {before["missing_bars"]} missing bars before, {after["missing_bars"]} after, '
+                  f'{after["duplicates"]} duplicates, {after["ohlc_errors"]} invalid candles')
 
 def main():
     #testing()
+    #bulk_download()
+    #repair()
     running()
     
 # run script
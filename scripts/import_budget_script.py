@@ -0,0 +1,94 @@
+import json
+import subprocess
+import sys
+
+# imported in a fresh interpreter, so nothing is cached from the parent
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{'ms': seconds * 1000, 'modules': sorted(m for m in {heavy} if m in sys.modules)}}))
+"""
+# the import the budgets are relative to, so they scale with the speed and load of the machine
+REFERENCE = 'import pandas'
+
+def measure_import(statement: str, heavy: list):
+    """
+    Measures an import statement once in a fresh interpreter.
+
+    Args:
+        statement (str): The import statement, ex: from stock_chart_cnn import CoinbaseWrapper.
+        heavy (list): The modules to check for after the import.
+
+    Returns:
+        tuple: The import time in milliseconds and the heavy modules it loaded.
+    """
+    output = subprocess.run([sys.executable, '-c', MEASURE.format(statement=statement, heavy=heavy)],
+                            capture_output=True, text=True, check=True).stdout
+    record = json.loads(output)
+    return record['ms'], record['modules']
+
+def measure_relative(name: str, heavy: list, repeats=7):
+    """
+    Measures the import of a public name of the package against the reference import. The two are
+    measured in turns, so a busy machine slows both, and the fastest of each is kept.
+
+    Args:
+        name (str): The name imported from stock_chart_cnn, ex: CoinbaseWrapper.
+        heavy (list): The modules to check for after the import.
+        repeats (int, optional): The number of interpreters started for each import. Defaults to 7.
+
+    Returns:
+        tuple: The import time in milliseconds, the reference time in milliseconds and the heavy modules loaded.
+    """
+    best, reference, modules = None, None, []
+    for _ in range(repeats):
+        ms, loaded = measure_import(f'from stock_chart_cnn import {name}', heavy)
+        if best is None or ms < best:
+            best, modules = ms, loaded
+        ms, _ = measure_import(REFERENCE, heavy)
+        reference = ms if reference is None else min(reference, ms)
+    return best, reference, modules
+
+def running():
+    """
+    Function to check the import time of the package entry points.
+
+    This function imports each entry point in a fresh interpreter, as a pool worker does, and checks it against its
+    time budget and the heavy modules it must not load. The budgets are multiples of the time to import pandas, with
+    about twice the measured cost as headroom, so the check holds on slower or loaded machines; loading a forbidden
+    module fails it on any machine. It exits with an error when a budget is broken.
+    """
+    # presets for running
+    # the modules that are slow to import and only needed by some entry points
+    heavy = ['lightweight_charts', 'torch', 'requests', 'pandas', 'PIL']
+    # import time budget relative to the reference import and the heavy modules each entry point may not load
+    budgets = {
+        'Metrics': (0.1, ['lightweight_charts', 'torch', 'requests', 'pandas', 'PIL']),
+        'compute_labels': (2.0, ['lightweight_charts', 'torch', 'requests']),
+        'CoinbaseWrapper': (2.5, ['lightweight_charts', 'torch']),
+        'ChartImage': (2.5, ['lightweight_charts', 'torch', 'requests']),
+        'ParallelGenerator': (3.0, ['lightweight_charts', 'torch', 'requests']),
+    }
+
+    failed = False
+    for name, (budget, forbidden) in budgets.items():
+        ms, reference, modules = measure_relative(name, heavy)
+        loaded = [module for module in modules if module in forbidden]
+        ok = ms <= budget * reference and not loaded
+        failed |= not ok
+        line = f'{"ok  " if ok else "FAIL"} {name}: {ms:.0f} ms, {ms / reference:.2f}x {REFERENCE} '
+        line += f'(budget {budget}x of {reference:.0f} ms), loads {", ".join(modules) or "nothing heavy"}'
+        if loaded:
+            line += f', must not load {", ".join(loaded)}'
+        print(line)
+    if failed:
+        sys.exit(1)
+
+def main():
+    running()
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import time
+from stock_chart_cnn import InferenceHTTPServer, InferenceServer, load_model
+
+def running():
+    """
+    Function to serve a trained model over HTTP.
+
+    This function loads the model, starts the batching inference server and its HTTP front end, and prints the
+    latency and throughput metrics every minute. Frames are posted to /predict as encoded images, or as JSON
+    candle windows that are rendered with the training chart settings.
+    """
+    # presets for running
+    model_path = 'models/chart_cnn.pt'
+    chart_width = 250
+    chart_height = 250
+    # largest batch and longest wait of a request for its batch
+    max_batch = 32
+    max_wait = 0.005
+    # threads used by torch for one batch
+    threads = 4
+    port = 8000
+
+    model = load_model(model_path, threads=threads)
+    server = InferenceServer(model, frame_shape=(chart_height, chart_width, 3), max_batch=max_batch,
+                             max_wait=max_wait)
+    with InferenceHTTPServer(server, port=port) as http_server:
+        print(f'Serving {model_path} on {http_server.url}')
+        try:
+            while True:
+                time.sleep(60)
+                print(server.metrics())
+        except KeyboardInterrupt:
+            pass
+    server.stop()
+
+def main():
+    running()
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,48 @@
-from .chart_image import ChartImage
-from .coinbase_wrapper import CoinbaseWrapper
\ No newline at end of file
+import importlib
+
+# the submodule of every public name, a submodule is only imported when one of its names is first used,
+# so a worker that only downloads or only computes labels never imports the chart and torch stacks
+_LAZY_IMPORTS = {
+    'CandleStore': 'candle_store',
+    'CandleWindow': 'candle_window',
+    'ChartImage': 'chart_image',
+    'ChartRenderer': 'chart_renderer',
+    'ChartSession': 'chart_session',
+    'ChartSessionPool': 'chart_session',
+    'CoinbaseWrapper': 'coinbase_wrapper',
+    'ChartDataset': 'dataset',
+    'FrameCache': 'frame_cache',
+    'FrameStore': 'frame_store',
+    'AsyncFrameWriter': 'frame_writer',
+    'InferenceHTTPServer': 'inference',
+    'InferenceServer': 'inference',
+    'load_model': 'inference',
+    'compute_labels': 'labels',
+    'load_labels': 'labels',
+    'Metrics': 'metrics',
+    'ParallelGenerator': 'parallel_generator',
+    'FramePostprocessor': 'postprocess',
+    'resample_candles': 'resample',
+    'resample_csv': 'resample',
+    'ResponseCache': 'response_cache',
+    'ShardDataset': 'shards',
+    'ShardWriter': 'shards',
+    'ChartStream': 'streaming',
+    'PollingSource': 'streaming',
+    'ReplaySource': 'streaming',
+    'repair_candles': 'validation',
+    'validate_candles': 'validation',
+}
+
+__all__ = sorted(_LAZY_IMPORTS)
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module('.' + _LAZY_IMPORTS[name], __name__), name)
+    # later lookups find the name without calling __getattr__
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
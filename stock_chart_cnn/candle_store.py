@@ -0,0 +1,237 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from .resample import dates_to_epoch, epoch_to_dates
+
+class CandleStore:
+    COLUMNS = ['low', 'high', 'open', 'close', 'volume']
+
+    def __init__(self, root='data/crypto/store'):
+        """
+        Initialize a CandleStore object. Each series is kept as a directory of typed .npy columns,
+        int64 epoch seconds in 'date.npy' and float64 prices and volume, which are memory-mapped on
+        read so only the requested rows are touched.
+
+        Args:
+            root (str, optional): The root directory of the store. Defaults to 'data/crypto/store'.
+        """
+        self._root = Path(root)
+
+    def series_dir(self, ticker: str, bartime: str):
+        """
+        Creates the directory path of a series.
+
+        Args:
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+
+        Returns:
+            Path: The directory holding the columns of the series.
+        """
+        return self._root / ticker / '{t}_{b}'.format(t=ticker, b=bartime)
+
+    def exists(self, ticker: str, bartime: str):
+        return (self.series_dir(ticker, bartime) / 'date.npy').exists()
+
+    def write(self, ticker: str, bartime: str, df: pd.DataFrame):
+        """
+        Writes a series, replacing what is stored.
+
+        Args:
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+            df (pd.DataFrame): The candles with a 'date' column or index and columns low, high, open, close, volume.
+        """
+        if 'date' in df.columns:
+            df = df.set_index('date')
+        epoch = dates_to_epoch(df.index)
+        order = np.argsort(epoch, kind='stable')
+        series_dir = self.series_dir(ticker, bartime)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        for column in self.COLUMNS:
+            self._save_column(series_dir / f'{column}.npy', df[column].to_numpy(dtype=np.float64)[order])
+        # the dates are written last, a series only counts as stored once they exist
+        self._save_column(series_dir / 'date.npy', epoch[order])
+
+    @staticmethod
+    def _save_column(path: Path, values: np.ndarray):
+        """
+        Saves a column next to the old one and swaps it in, so readers still mapping the old
+        file are not cut off mid read.
+
+        Args:
+            path (Path): The path of the column file.
+            values (np.ndarray): The column values.
+        """
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _append_columns(series_dir: Path, columns: dict):
+        """
+        Appends rows to the column files in place. The rows are written after the stored ones and the
+        row count in each header is updated after them, the dates last, so readers see either the old
+        or the new series. Rows left past the stored dates by an interrupted append are overwritten.
+
+        Args:
+            series_dir (Path): The directory holding the columns of the series.
+            columns (dict): The values to append to each column, 'date' included.
+
+        Returns:
+            bool: False when a header has no room for the new row count, nothing is written then.
+        """
+        num_rows = len(np.load(series_dir / 'date.npy', mmap_mode='r'))
+        num_new = len(columns['date'])
+        headers = {}
+        for column in columns:
+            with open(series_dir / f'{column}.npy', 'rb') as f:
+                version = np.lib.format.read_magic(f)
+                prefix = f.tell() + (2 if version == (1, 0) else 4)
+                if version == (1, 0):
+                    _, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    _, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+                offset = f.tell()
+            header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order,
+                      'shape': (num_rows + num_new,)}
+            # the new header must fit in the space of the old one, np.save leaves room for the row count to grow
+            text = repr(header).encode('latin1')
+            if len(text) + 1 > offset - prefix:
+                return False
+            headers[column] = (prefix, offset, dtype, text.ljust(offset - prefix - 1) + b'\n')
+        for column in [c for c in columns if c != 'date'] + ['date']:
+            prefix, offset, dtype, text = headers[column]
+            with open(series_dir / f'{column}.npy', 'r+b') as f:
+                f.seek(offset + num_rows * dtype.itemsize)
+                f.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+                f.truncate()
+                f.flush()
+                f.seek(prefix)
+                f.write(text)
+        return True
+
+    def append(self, ticker: str, bartime: str, df: pd.DataFrame):
+        """
+        Adds candles to a stored series, candles already stored are kept. Candles after the last stored one
+        are appended to the column files in place; when any candle falls inside the stored series, the series
+        is read, merged and rewritten instead.
+
+        Args:
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+            df (pd.DataFrame): The candles to add.
+        """
+        if not self.exists(ticker, bartime):
+            # writing only the new candles would leave readers a truncated series
+            raise ValueError(f'No stored series for {ticker} {bartime}, write the whole series first')
+        if 'date' in df.columns:
+            df = df.set_index('date')
+        if df.empty:
+            return
+        epoch = dates_to_epoch(df.index)
+        order = np.argsort(epoch, kind='stable')
+        epoch = epoch[order]
+        # the first of every date is kept
+        keep = np.r_[True, np.diff(epoch) != 0]
+        stored = np.load(self.series_dir(ticker, bartime) / 'date.npy', mmap_mode='r')
+        last = int(stored[-1]) if len(stored) else None
+        del stored
+        if last is None or epoch[0] > last:
+            columns = {column: df[column].to_numpy(dtype=np.float64)[order][keep] for column in self.COLUMNS}
+            columns['date'] = epoch[keep]
+            if self._append_columns(self.series_dir(ticker, bartime), columns):
+                return
+        stored = self.read_df(ticker, bartime, dates='str').set_index('date')
+        df = pd.concat([stored, df[self.COLUMNS]])
+        self.write(ticker, bartime, df[~df.index.duplicated(keep='first')])
+
+    @staticmethod
+    def read_series(series_dir, start=None, end=None):
+        """
+        Reads the rows of a series between two timestamps without loading the whole series.
+
+        Args:
+            series_dir (str): The directory holding the columns of the series.
+            start (int, optional): The first epoch timestamp to read. Defaults to the start of the series.
+            end (int, optional): The last epoch timestamp to read. Defaults to the end of the series.
+
+        Returns:
+            dict: The 'date' epoch array and the low, high, open, close, volume arrays, as memory-mapped views.
+        """
+        series_dir = Path(series_dir)
+        date = np.load(series_dir / 'date.npy', mmap_mode='r')
+        # the dates are sorted, so the range is found by binary search
+        lo = 0 if start is None else np.searchsorted(date, start, side='left')
+        hi = len(date) if end is None else np.searchsorted(date, end, side='right')
+        columns = {'date': date[lo:hi]}
+        for column in CandleStore.COLUMNS:
+            columns[column] = np.load(series_dir / f'{column}.npy', mmap_mode='r')[lo:hi]
+        return columns
+
+    @staticmethod
+    def to_df(columns: dict, dates='datetime'):
+        """
+        Creates a DataFrame from the columns of a series.
+
+        Args:
+            columns (dict): The columns returned by read_series.
+            dates (str, optional): The type of the 'date' column (datetime, str, epoch). Defaults to 'datetime'.
+
+        Returns:
+            pd.DataFrame: The candles with columns ['date', 'low', 'high', 'open', 'close', 'volume'].
+        """
+        epoch = np.asarray(columns['date'])
+        if dates == 'datetime':
+            date = pd.to_datetime(epoch, unit='s')
+        elif dates == 'str':
+            date = epoch_to_dates(epoch)
+        else:
+            date = epoch
+        df = pd.DataFrame({column: np.asarray(columns[column]) for column in CandleStore.COLUMNS})
+        df.insert(0, 'date', date)
+        return df
+
+    def read(self, ticker: str, bartime: str, start=None, end=None):
+        """
+        Reads the rows of a series between two timestamps.
+
+        Args:
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+            start (int, optional): The first epoch timestamp to read.
+            end (int, optional): The last epoch timestamp to read.
+
+        Returns:
+            dict: The column arrays of the series.
+        """
+        return self.read_series(self.series_dir(ticker, bartime), start, end)
+
+    def read_df(self, ticker: str, bartime: str, start=None, end=None, dates='datetime'):
+        """
+        Reads the rows of a series between two timestamps as a DataFrame.
+
+        Args:
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+            start (int, optional): The first epoch timestamp to read.
+            end (int, optional): The last epoch timestamp to read.
+            dates (str, optional): The type of the 'date' column (datetime, str, epoch). Defaults to 'datetime'.
+
+        Returns:
+            pd.DataFrame: The candles.
+        """
+        return self.to_df(self.read(ticker, bartime, start, end), dates=dates)
+
+    def from_csv(self, filename: str, ticker: str, bartime: str):
+        """
+        Converts a formatted csv file into a stored series.
+
+        Args:
+            filename (str): The path to the formatted csv.
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+        """
+        self.write(ticker, bartime, pd.read_csv(filename))
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+class CandleWindow:
+    __slots__ = ('_capacity', '_ohlc', '_dates', '_head', '_size', '_count', '_offset')
+
+    def __init__(self, capacity: int, offset=0):
+        """
+        Initialize a CandleWindow object. A ring buffer of the last bars on screen. Every bar is written
+        twice, at its slot and one capacity further, so the bars in the window are always one contiguous
+        view of the buffer: appending and evicting are O(1) and reading the window never copies.
+
+        Args:
+            capacity (int): The number of bars kept, ex: num_bars_show.
+            offset (int, optional): The row of the series the first appended bar comes from. Defaults to 0.
+        """
+        self._capacity = capacity
+        self._ohlc = np.empty((2 * capacity, 4), dtype=np.float64)
+        self._dates = np.empty(2 * capacity, dtype=object)
+        self._head = 0
+        self._size = 0
+        self._count = 0
+        self._offset = offset
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ohlc(self):
+        """
+        The open, high, low, close prices of the bars in the window, oldest first, as a view.
+        """
+        return self._ohlc[self._head:self._head + self._size]
+
+    @property
+    def dates(self):
+        """
+        The dates of the bars in the window, oldest first, as a view.
+        """
+        return self._dates[self._head:self._head + self._size]
+
+    @property
+    def start(self):
+        """
+        The row of the series of the oldest bar in the window.
+        """
+        return self._offset + self._count - self._size
+
+    @property
+    def end(self):
+        """
+        The row of the series after the newest bar in the window.
+        """
+        return self._offset + self._count
+
+    @property
+    def timestamp(self):
+        """
+        The date of the newest bar in the window.
+        """
+        return self._dates[self._head + self._size - 1]
+
+    def append(self, date, ohlc):
+        """
+        Adds a bar, evicting the oldest one when the window is full.
+
+        Args:
+            date (str): The date of the bar, None if dates are not kept.
+            ohlc (tuple): The open, high, low, close prices of the bar.
+        """
+        if self._size < self._capacity:
+            slot = (self._head + self._size) % self._capacity
+            self._size += 1
+        else:
+            slot = self._head
+            self._head = (self._head + 1) % self._capacity
+        self._ohlc[slot] = self._ohlc[slot + self._capacity] = ohlc
+        if date is not None:
+            self._dates[slot] = self._dates[slot + self._capacity] = date
+        self._count += 1
+
+    def extend(self, dates: np.ndarray, ohlc: np.ndarray):
+        """
+        Adds bars in one step, evicting the oldest ones when the window is full.
+
+        Args:
+            dates (np.ndarray): The dates of the bars, None if dates are not kept.
+            ohlc (np.ndarray): The (N, 4) open, high, low, close prices of the bars.
+        """
+        num = len(ohlc)
+        self._count += num
+        if num >= self._capacity:
+            # only the newest bars fit, they fill the buffer from the start
+            self._ohlc[:self._capacity] = self._ohlc[self._capacity:] = ohlc[num - self._capacity:]
+            if dates is not None:
+                self._dates[:self._capacity] = self._dates[self._capacity:] = dates[num - self._capacity:]
+            self._head, self._size = 0, self._capacity
+            return
+        slots = (self._head + self._size + np.arange(num)) % self._capacity
+        self._ohlc[slots] = self._ohlc[slots + self._capacity] = ohlc
+        if dates is not None:
+            self._dates[slots] = self._dates[slots + self._capacity] = dates
+        total = self._size + num
+        if total > self._capacity:
+            self._head = (self._head + total - self._capacity) % self._capacity
+        self._size = min(total, self._capacity)
+
+    def clear(self, offset=0):
+        """
+        Removes every bar.
+
+        Args:
+            offset (int, optional): The row of the series the next appended bar comes from. Defaults to 0.
+        """
+        self._head = self._size = self._count = 0
+        self._offset = offset
+
+    def to_df(self):
+        """
+        Copies the window to a DataFrame, for the csv steps and the charts that take DataFrames.
+
+        Returns:
+            pd.DataFrame: The bars with columns date, open, high, low, close indexed by their row in the series.
+        """
+        ohlc = self.ohlc.copy()
+        return pd.DataFrame({'date': self.dates.copy(), 'open': ohlc[:, 0], 'high': ohlc[:, 1], 'low': ohlc[:, 2],
+                             'close': ohlc[:, 3]}, index=pd.RangeIndex(self.start, self.end))
@@ -1,16 +1,30 @@
+import numpy as np
 import pandas as pd
-from lightweight_charts import Chart
+from importlib import metadata
 from pathlib import Path
+import logging
 import random
+from .candle_store import CandleStore
+from .candle_window import CandleWindow
+from .chart_renderer import ChartRenderer, RasterChart
+from .chart_session import ChartSession
+from .labels import align_windows, compute_labels, frame_windows, plan_batches, save_labels
+from .metrics import Metrics
+from .postprocess import FORMAT_EXTENSIONS, sniff_format
+from .resample import bartime_to_seconds, dates_to_epoch, resample_candles
+from .validation import gapped_windows
 
 class ChartImage:
     def __init__(self, filename, ticker: str, bartime: str, chart_type: str, parentdir: str,
-                    barspacing=1.5, num_bars_show=120, num_bar_gen=20, chart_width=1200, chart_height=600):
+                    barspacing=1.5, num_bars_show=120, num_bar_gen=20, chart_width=1200, chart_height=600,
+                    backend='lightweight', sink=None, session=None, postprocessor=None, cache=None, metrics=None,
+                    writer=None, skip_gaps=False):
         """
         Initialize a ChartImage object.
 
         Args:
-            filename (str): The path to the CSV file containing the chart data.
+            filename (str or pd.DataFrame): The path to the CSV file containing the chart data, or to a CandleStore
+                                            series directory, or the data itself.
             ticker (str): The name of the ticker.
             bartime (str): The bartimes of the chart.
             chart_type (str): The type of chart (candle, line).
@@ -20,8 +34,33 @@ class ChartImage:
             num_bar_gen (int, optional): The amount of new bars to generate before a screenshot. Defaults to 20.
             chart_width (int, optional): The width of the chart. Defaults to 1200.
             chart_height (int, optional): The height of the chart. Defaults to 600.
+            backend (str, optional): The renderer used for the chart (lightweight, numpy). 'numpy' draws the
+                                        frames headless with a ChartRenderer. Defaults to 'lightweight'.
+            sink (object, optional): An output with a write(image, info) method, such as a FrameStore, that receives
+                                        every frame instead of it being saved as its own file. Defaults to None.
+            session (ChartSession, optional): A warm chart session shared with other ChartImage objects. A new
+                                                session is started on first use if not provided.
+            postprocessor (FramePostprocessor, optional): Crops and masks every frame in memory before it is
+                                                            written to inputs/clean. Defaults to None.
+            cache (FrameCache, optional): Skips frames already rendered with the same bars and chart settings,
+                                            new frames are named by their content key. Not used with a sink,
+                                            which has to receive every frame. Defaults to None.
+            metrics (Metrics, optional): Records the time spent parsing, rendering and writing and the frame counts.
+                                            Defaults to the metrics of the session, or a new Metrics object.
+            writer (AsyncFrameWriter, optional): Encodes and writes the frame files on its own threads, so
+                                                    rendering does not wait for the disk. Defaults to None, the
+                                                    files are written in the render loop.
+            skip_gaps (bool, optional): Skips the frames whose bars on screen span a missing interval, their ids
+                                        are left unused so the other frames keep theirs. Defaults to False.
         """
-        self._df = self.read_csv(filename)
+        if backend not in ('lightweight', 'numpy'):
+            raise ValueError(f'Unsupported backend: {backend}')
+        if metrics is None:
+            metrics = Metrics() if session is None else session.metrics
+        self._metrics = metrics
+        # the series can be given in memory, ex: a larger bartime derived by derive_timeframe
+        with self._metrics.timer('parse'):
+            self._df = filename if isinstance(filename, pd.DataFrame) else self.read_csv(filename)
         self._ticker = ticker
         self._bartime = bartime
         self._chart_type = chart_type
@@ -31,53 +70,82 @@ class ChartImage:
         self._num_bar_gen = num_bar_gen
         self._chart_width = chart_width
         self._chart_height = chart_height
+        self._backend = backend
+        self._sink = sink
+        self._postprocessor = postprocessor
+        self._cache = cache
+        self._writer = writer
+        self._skip_gaps = skip_gaps
+        self._owns_session = session is None
+        self._session = ChartSession(self._setup_chart, metrics) if session is None else session
         self._id = random.randint(0,100_000)
+        # larger bartimes derived from the series and their chart image generators
+        self._derived = {}
+        self._timeframe_charts = {}
 
     def _setup_chart(self):
         """
         Sets up and returns a Chart object with specified width and height.
         
         Returns:
-            chart (Chart): The initialized Chart object.
+            chart (Chart or RasterChart): The initialized Chart object, a RasterChart for the numpy backend.
         """
+        if self._backend == 'numpy':
+            renderer = ChartRenderer(chart_width=self._chart_width, chart_height=self._chart_height,
+                                     chart_type=self._chart_type, barspacing=self._barspacing)
+            return RasterChart(renderer)
+        # imported on first use, it pulls in the webview stack the numpy backend does not need
+        try:
+            from lightweight_charts import Chart
+        except ImportError as error:
+            raise ImportError("lightweight_charts is required for the 'lightweight' backend, "
+                              "use backend='numpy' without it") from error
         chart = Chart(self._chart_width, self._chart_height)
         chart.crosshair('hidden')
         chart.grid(False,False)
         return chart
     
-    def read_csv(self, filename: str):
+    @staticmethod
+    def read_csv(filename: str):
         """
-        Reads a CSV file and returns the data as a pandas DataFrame.
+        Reads a CSV file and returns the data as a pandas DataFrame. A CandleStore series directory
+        can be given instead of a CSV file, its columns are memory-mapped rather than parsed.
 
         Parameters:
-        filename (str): The path to the CSV file.
+        filename (str): The path to the CSV file, or to a CandleStore series directory.
 
         Returns:
         pandas.DataFrame: The data read from the CSV file, with columns in the order ['date', 'open', 'high', 'low', 'close'].
         If the file does not exist or the formatting is incorrect, None is returned.
         """
         try:
-            data = pd.read_csv(filename)
+            if Path(filename).is_dir():
+                data = CandleStore.to_df(CandleStore.read_series(filename))
+            else:
+                data = pd.read_csv(filename)
             # set the columns to the correct order and values
             data = data[['date','open','high','low','close']]
             return data
         except Exception:
-            print('File does not exist or formatting is wrong')
+            logging.getLogger(__name__).error(f'File {filename} does not exist or formatting is wrong')
             return None
     
-    def save_csv_step(self, data: pd.DataFrame):
+    def save_csv_step(self, data: pd.DataFrame, key=None):
         """
         Saves the data to a CSV file.
 
         Args:
             data (pd.DataFrame): The data to be saved to the file.
+            key (str, optional): The content key of the frame, used in the filename instead of the id
+                                    like the screenshot it pairs with.
         """
         # gen bar units
         _, unit = self._bartime.split('_')
         # create the filename
         filename = '{t}_{b}_{c}_{bs}_{nbs}_{nbg}_{id}'.format(t=self._ticker,b=self._bartime,
                                                               c=self._chart_type,u=unit,bs=str(self._barspacing),
-                                                              id=self._id, nbs=str(self._num_bars_show),
+                                                              id=self._id if key is None else key,
+                                                              nbs=str(self._num_bars_show),
                                                               nbg=str(self._num_bar_gen))
         # root directory for the file
         file_root = 'inputs/raw/{p}/csv/{t}/{c}/{b}/{f}_data.csv'.format(p=self._parentdir,t=self._ticker,
@@ -88,57 +156,181 @@ class ChartImage:
         # save the data to the file
         data.to_csv(filepath, index=False)
         
-    def save_screenshot(self, image: list):
+    def save_screenshot(self, image: list, window=None, key=None):
         """
-        Saves the screenshot image to a file.
+        Saves the screenshot image to a file, or hands it to the sink if one is set. With a
+        postprocessor the cropped frame and its masked variants are written instead of the raw image.
 
         Args:
             image (list): The screenshot image data.
-            start (int): The start index.
-            end (int): The end index.
+            window (CandleWindow, optional): The bars on screen, recorded in the sink index.
+            key (str, optional): The content key of the frame, used in the filename instead of the id.
+
+        Returns:
+            dict: Where the frame was saved, the 'path' of the file or the 'id' handed to the sink.
         """
         self._id += 1
+        outputs = None
+        if self._postprocessor is not None:
+            # crop, convert and mask in memory before anything is written
+            with self._metrics.timer('postprocess'):
+                outputs = self._postprocessor.process(image)
+            image = outputs['cropped']
+        if self._sink is not None:
+            info = {'id': self._id, 'ticker': self._ticker, 'bartime': self._bartime}
+            if window is not None:
+                info.update(start=window.start, end=window.end, timestamp=window.timestamp)
+            with self._metrics.timer('write'):
+                self._sink.write(image, info)
+            self._metrics.count('frames_saved')
+            return {'id': self._id}
         # gen bar units
         _, unit = self._bartime.split('_')
         # create the filename
         filename = '{t}_{b}_{c}_{bs}_{nbs}_{nbg}_{id}'.format(t=self._ticker,b=self._bartime,
                                                               c=self._chart_type,u=unit,bs=str(self._barspacing),
-                                                              id=self._id, nbs=str(self._num_bars_show),
+                                                              id=self._id if key is None else key,
+                                                              nbs=str(self._num_bars_show),
                                                               nbg=str(self._num_bar_gen))
+        if outputs is not None:
+            # root directory for the cleaned files
+            out_root = 'inputs/clean/{p}/images/{t}/{c}/{b}'.format(p=self._parentdir,t=self._ticker,
+                                                                     c=self._chart_type,b=self._bartime)
+            paths = self._postprocessor.output_paths(out_root, filename)
+            # encodes and writes every output
+            with self._metrics.timer('write'):
+                if self._writer is not None:
+                    for name, frame in outputs.items():
+                        self._writer.submit(paths[name], frame, self._postprocessor.encode)
+                else:
+                    self._postprocessor.write(outputs, paths)
+            self._metrics.count('frames_saved')
+            return {'path': str(paths['cropped'])}
+        # the extension of the format written, screenshots are PNG unless the writer encodes them
+        extension = self._writer.extension(image) if self._writer is not None else FORMAT_EXTENSIONS.get(
+            sniff_format(image), 'png')
         # root directory for the file
-        file_root = 'inputs/raw/{p}/images/{t}/{c}/{b}/{f}_screenshot.jpg'.format(p=self._parentdir,t=self._ticker,
-                                                                                  c=self._chart_type,b=self._bartime,f=filename)
+        file_root = 'inputs/raw/{p}/images/{t}/{c}/{b}/{f}_screenshot.{e}'.format(p=self._parentdir,t=self._ticker,
+                                                                                  c=self._chart_type,b=self._bartime,
+                                                                                  f=filename,e=extension)
         # create the file path
         filepath = Path(file_root)
+        self._metrics.count('frames_saved')
+        if self._writer is not None:
+            # encoded and written on the writer threads
+            with self._metrics.timer('write'):
+                self._writer.submit(filepath, image)
+            return {'path': str(filepath)}
         filepath.parent.mkdir(parents=True, exist_ok=True)
         # save the image to the file
-        with open(filepath, "wb") as out:
+        with self._metrics.timer('write'), open(filepath, "wb") as out:
             out.write(image)
+        self._metrics.count('bytes_written', len(image))
+        return {'path': str(filepath)}
     
-    @staticmethod
-    def _take_screenshot(chart: Chart, data: pd.DataFrame):
+    def _capture(self, session: ChartSession):
+        """
+        Takes a screenshot of the chart. Sinks, postprocessors and writers work on arrays, so the
+        encode and decode round trip is skipped when the chart can render an array directly.
+
+        Args:
+            session (ChartSession): The session holding the chart.
+
+        Returns:
+            bytes or np.ndarray: The screenshot image data.
+        """
+        if (self._sink is not None or self._postprocessor is not None or self._writer is not None) \
+                and session.renders_arrays:
+            return session.screenshot_array()
+        return session.screenshot()
+
+    def _save_frame(self, image, window: CandleWindow, csv_step: bool, key=None):
         """
-        Takes a screenshot of the chart within the specified range.
+        Saves a captured frame, and the csv of the data on screen if requested.
 
         Args:
-            chart (Chart): The chart object.
-            start (int): The start index of the data to be added to the chart.
-            end (int): The end index of the data to be added to the chart.
+            image (bytes or np.ndarray): The screenshot image data.
+            window (CandleWindow): The bars on screen.
+            csv_step (bool): Whether to save the csv step.
+            key (str, optional): The content key of the frame, recorded in the cache and used in the filenames.
+        """
+        with self._session.timer('save'):
+            location = self.save_screenshot(image, window, key)
+            if csv_step:
+                self.save_csv_step(window.to_df(), key)
+        if key is not None:
+            self._cache.add(key, dict(location, ticker=self._ticker, bartime=self._bartime,
+                                      start=window.start, end=window.end, timestamp=window.timestamp))
+
+    def _backend_version(self):
+        """
+        Returns the version of the renderer, part of the frame cache key.
+        """
+        if self._backend == 'numpy':
+            return 'numpy-{v}'.format(v=ChartRenderer.VERSION)
+        try:
+            return 'lightweight-{v}'.format(v=metadata.version('lightweight-charts'))
+        except metadata.PackageNotFoundError:
+            return 'lightweight'
+
+    def _frame_key(self, window: CandleWindow):
+        """
+        Creates the cache key of a frame from the bars on screen and the chart settings.
+
+        Args:
+            window (CandleWindow): The bars on screen.
 
         Returns:
-            bytes: The screenshot image data.
-        """
-        # add the first set of data to the chart
-        chart.set(data)
-        # fit bars to the chart
-        chart.fit()
-        # display the chart
-        chart.show()
-        # take a screen shot of the chart
-        image = chart.screenshot()
-        # exit the chart
-        chart.exit()
-        return image
+            str: The content key, or None without a cache or with a sink.
+        """
+        # a cached frame is a file of an earlier run, a fresh store or shard directory would miss it
+        if self._cache is None or self._sink is not None:
+            return None
+        params = {'chart_type': self._chart_type, 'barspacing': self._barspacing,
+                  'num_bars_show': self._num_bars_show, 'chart_width': self._chart_width,
+                  'chart_height': self._chart_height, 'backend': self._backend_version()}
+        if self._postprocessor is not None:
+            params['postprocessor'] = self._postprocessor.signature
+        elif self._writer is not None:
+            params['writer'] = self._writer.signature
+        return self._cache.key(window.ohlc, params)
+
+    @property
+    def metrics(self):
+        """
+        The metrics of the run, shared with the chart session.
+        """
+        return self._metrics
+
+    @property
+    def sink(self):
+        """
+        The output the frames are handed to, None when every frame is saved as its own file. It can be
+        replaced between runs, ex: a new ShardWriter for each batch, and is shared with the larger bartimes.
+        """
+        return self._sink
+
+    @sink.setter
+    def sink(self, sink):
+        self._sink = sink
+        for chart_image_gen in self._timeframe_charts.values():
+            chart_image_gen.sink = sink
+
+    @property
+    def session(self):
+        """
+        The chart session used for rendering, can be passed to other ChartImage objects with the
+        same chart settings to share the warm chart.
+        """
+        return self._session
+
+    def close(self):
+        """
+        Exits the chart of the session, and those of the larger bartimes.
+        """
+        self._session.close()
+        for chart_image_gen in self._timeframe_charts.values():
+            chart_image_gen.close()
                 
     def sample_screenshots(self):
         """
@@ -147,95 +339,248 @@ class ChartImage:
         Returns:
             tuple: A tuple containing two images of the chart.
         """
-        # initialize the chart to the presets
-        chart = self._setup_chart()
         # starting and ending index for the starting state
         start, end = 0, self._num_bars_show
-        image1 = self._take_screenshot(chart, self._df.iloc[start:end])
+        self._session.set(self._df.iloc[start:end])
+        image1 = self._session.screenshot()
         
-        # init new chart
-        chart = self._setup_chart()
-        # take a screenshot of the chart after incrementing
+        # reuse the chart to take a screenshot after incrementing
         start, end = self._num_bar_gen, end + self._num_bar_gen
-        image2 = self._take_screenshot(chart, self._df.iloc[start:end])
+        self._session.set(self._df.iloc[start:end])
+        image2 = self._session.screenshot()
         return image1, image2
     
-    def create_chart_images(self, data, csv_step, start=0, end=None):
+    def create_chart_images(self, data, csv_step, start=0, end=None, image_id=None):
         """
-        Creates and saves chart images based on the provided data.
+        Creates and saves chart images based on the provided data. The frames follow labels.frame_windows,
+        so labels computed for the same data line up with the saved images. The chart of the session is
+        kept open afterwards so the next call only has to reset its data.
 
         Args:
             data (pandas.DataFrame): The data used to generate the chart images.
             start (int, optional): The starting index of the data. Defaults to 0.
-            end (int, optional): The ending index of the data. If not provided, it is set to self._num_bars_show.
+            end (int, optional): The ending index of the data. If not provided, it is set to start + self._num_bars_show.
+            image_id (int, optional): The id the image numbering continues from. If not provided, the numbering
+                                        continues from the last saved image.
 
         Returns:
-            None
+            int: The number of images saved.
         """
-        # initialize the chart to the presets
-        chart = self._setup_chart()
+        if image_id is not None:
+            self._id = image_id
+        first_id = self._id
         # starting and ending index for the starting state
         if end is None:
-            end = self._num_bars_show
-        
-        # add the first set of data to the chart
-        chart.set(data.iloc[start:end])
-        # fit bars to the chart
-        chart.fit()
-        # display the chart
-        chart.show()
-        
-        # take a screenshot of the chart at starting state
-        image = chart.screenshot()
-        # save the screenshot
-        self.save_screenshot(image)
-        # save the csv of the data on the screen
-        if csv_step:
-            self.save_csv_step(data.iloc[start:end])
-        
-        # intialize variables to keep track of updates
-        count, start, idx = 0, start + self._num_bar_gen, end
-        
-        
+            end = start + self._num_bars_show
+        starts, ends = frame_windows(len(data), end - start, self._num_bar_gen, start)
+        skipped = self._render_windows(data, starts, ends, end - start, csv_step)
+        self._flush()
+        return self._id - first_id - skipped
+
+    def _render_windows(self, data: pd.DataFrame, starts: np.ndarray, ends: np.ndarray, num_bars_show: int,
+                        csv_step: bool):
+        """
+        Renders and saves a frame for each window of the data. The ends never decrease, so the chart is
+        only given the new bars of each window, and a window equal to the previous one reuses its image.
+
+        Args:
+            data (pd.DataFrame): The data the windows index into.
+            starts (np.ndarray): The start rows of the windows.
+            ends (np.ndarray): The end rows (exclusive) of the windows.
+            num_bars_show (int): The number of bars on screen.
+            csv_step (bool): Whether to save the csv step.
+
+        Returns:
+            int: The number of frames skipped, for spanning a gap or being in the frame cache.
+        """
+        if len(ends) == 0:
+            return 0
+        session = self._session
+        # the loop works on arrays, pandas is only used to set the first frame
+        ohlc = data[['open','high','low','close']].to_numpy(dtype=np.float64)
+        dates = data['date'].to_numpy()
+        gapped = np.zeros(len(ends), dtype=bool)
+        if self._skip_gaps:
+            gapped = gapped_windows(dates_to_epoch(dates), bartime_to_seconds(self._bartime), starts, ends)
+        # the bars on screen, rows are numbered as in the index of the data
+        window = CandleWindow(num_bars_show, offset=int(data.index[0] + starts[0]))
+        window.extend(dates[starts[0]:ends[0]], ohlc[starts[0]:ends[0]])
         
-        # loop through the data and take screenshots
-        while idx < data['date'].size:
-            # update the chart with the next set of data
-            chart.update(data.iloc[idx])
-            # if we have generated enough bars or we are at the end of the data
-            if count == self._num_bar_gen or idx + 1 == data['date'].size:
-                # take a screen shot of the chart
-                image = chart.screenshot()
-                self.save_screenshot(image)
-                # save the csv step of the data
-                if csv_step:
-                    self.save_csv_step(data.iloc[start:idx])
-                
-                # reset the count
-                count = 0
-                # increment the index
-                idx += 1
-                # increment the start index
-                start += self._num_bar_gen
+        # add the first set of data to the chart and display it
+        session.set(data.iloc[starts[0]:ends[0]])
+        image = None
+        cached = 0
+        # loop through the frames and take screenshots
+        for i, frame_end in enumerate(ends):
+            if i > 0 and frame_end != ends[i - 1]:
+                # update the chart with the new bars, the chart scrolls to keep the same number on screen
+                frame_start = ends[i - 1]
+                session.extend(dates[frame_start:frame_end], ohlc[frame_start:frame_end])
+                window.extend(dates[frame_start:frame_end], ohlc[frame_start:frame_end])
+                image = None
+            if gapped[i]:
+                # the id of the frame is skipped with it
+                self._id += 1
+                self._metrics.count('frames_gapped')
+                continue
+            key = self._frame_key(window)
+            # frames rendered by an earlier run are skipped
+            if key is not None and self._cache.get(key) is not None:
+                # the id of the frame is skipped with it, so the next frames keep theirs
+                self._id += 1
+                cached += 1
+                self._metrics.count('frames_cached')
                 continue
-            # increment the index
-            idx += 1
-            # increment the count
-            count += 1
-        chart.exit()
+            # take a screen shot of the chart
+            if image is None:
+                image = self._capture(session)
+            # save the screenshot and the csv step of the data
+            self._save_frame(image, window, csv_step, key)
+        return int(gapped.sum()) + cached
+
+    def _flush(self):
+        """
+        Flushes the sink, the writer and the frame cache. The cache is flushed last, so it never lists
+        a frame that is not on disk.
+        """
+        if self._sink is not None and hasattr(self._sink, 'flush'):
+            self._sink.flush()
+        if self._writer is not None:
+            self._writer.flush()
+        if self._cache is not None:
+            self._cache.flush()
+
+    def derive_timeframe(self, bartime: str):
+        """
+        Resamples the series into a larger bartime in memory, ex: 4_hour candles from the 1_hour series.
+        Buckets not fully covered at the edges of the series are dropped.
+
+        Args:
+            bartime (str): The larger bartime.
+
+        Returns:
+            pd.DataFrame: The candles with columns ['date', 'open', 'high', 'low', 'close'].
+        """
+        if bartime not in self._derived:
+            with self._metrics.timer('resample'):
+                derived = resample_candles(self._df, bartime, base_bartime=self._bartime, trim_partial=True)
+            self._derived[bartime] = derived.reset_index()[['date','open','high','low','close']]
+        return self._derived[bartime]
+
+    def create_multi_timeframe_images(self, bartimes: list, csv_step=False, start=0, end=None):
+        """
+        Creates time-aligned frame sets: for every frame of the series, a frame of each larger bartime
+        ending at the same time, derived from the series in memory instead of read from its own csv.
+        The frames of a set share their id, the number of the base frame in the series as in
+        save_labels, and are saved under their own bartime. Frames whose larger bartime windows do not
+        have num_bars_show closed bars yet are left out.
+
+        Args:
+            bartimes (list): The larger bartimes, ex: ['4_hour', '1_day'].
+            csv_step (bool, optional): Whether to save the csv step of every frame. Defaults to False.
+            start (int, optional): The first row of the frames rendered, ex: a batch from plan_batches. Defaults to 0.
+            end (int, optional): The row the frames rendered end before. Defaults to the end of the series.
+
+        Returns:
+            int: The number of frame sets saved.
+        """
+        end = len(self._df) if end is None else end
+        base_starts, base_ends = frame_windows(len(self._df), self._num_bars_show, self._num_bar_gen)
+        base_epoch = dates_to_epoch(self._df['date'])
+        base_seconds = bartime_to_seconds(self._bartime)
+        windows = {}
+        for bartime in bartimes:
+            derived = self.derive_timeframe(bartime)
+            windows[bartime] = align_windows(base_epoch, base_seconds, dates_to_epoch(derived['date']),
+                                             bartime_to_seconds(bartime), base_ends, self._num_bars_show)
+        # a set needs full windows in every bartime and its base frame inside the rows asked for
+        keep = (base_starts >= start) & (base_ends <= end) & (base_ends - base_starts == self._num_bars_show)
+        for starts, ends in windows.values():
+            keep &= ends - starts == self._num_bars_show
+        frames = np.flatnonzero(keep)
+        if len(frames) == 0:
+            return 0
+
+        self._id = int(frames[0])
+        self._render_windows(self._df, base_starts[frames], base_ends[frames], self._num_bars_show, csv_step)
+        self._flush()
+        for bartime, (starts, ends) in windows.items():
+            chart_image_gen = self._timeframe_chart(bartime)
+            chart_image_gen._id = int(frames[0])
+            chart_image_gen._render_windows(chart_image_gen._df, starts[frames], ends[frames],
+                                            self._num_bars_show, csv_step)
+            chart_image_gen._flush()
+        return len(frames)
+
+    def _timeframe_chart(self, bartime: str):
+        """
+        Returns the ChartImage rendering a larger bartime derived from the series, with the same chart
+        settings and outputs but its own chart session.
+
+        Args:
+            bartime (str): The larger bartime.
+
+        Returns:
+            ChartImage: The chart image generator of the bartime.
+        """
+        if bartime not in self._timeframe_charts:
+            self._timeframe_charts[bartime] = ChartImage(self.derive_timeframe(bartime), self._ticker, bartime,
+                                                         self._chart_type, self._parentdir,
+                                                         barspacing=self._barspacing,
+                                                         num_bars_show=self._num_bars_show,
+                                                         num_bar_gen=self._num_bar_gen,
+                                                         chart_width=self._chart_width,
+                                                         chart_height=self._chart_height, backend=self._backend,
+                                                         sink=self._sink, postprocessor=self._postprocessor,
+                                                         cache=self._cache, metrics=self._metrics,
+                                                         writer=self._writer, skip_gaps=self._skip_gaps)
+        return self._timeframe_charts[bartime]
+
+    def save_labels(self, data=None, horizon=5, image_id=0, start=0):
+        """
+        Computes the forward targets of every frame create_chart_images renders for the data and
+        saves them as a single array file keyed by image id.
+
+        Args:
+            data (pd.DataFrame, optional): The data the images are created from. Defaults to the whole series.
+            horizon (int, optional): The number of bars after each frame to look at. Defaults to 5.
+            image_id (int, optional): The image_id passed to create_chart_images. Defaults to 0.
+            start (int, optional): The start passed to create_chart_images. Defaults to 0.
+
+        Returns:
+            dict: The label arrays.
+        """
+        if data is None:
+            data = self._df
+        labels = compute_labels(data, self._num_bars_show, self._num_bar_gen, horizon=horizon,
+                                first_id=image_id, start=start)
+        # create the filename
+        filename = '{t}_{b}_{c}_{bs}_{nbs}_{nbg}_{id}'.format(t=self._ticker,b=self._bartime,
+                                                              c=self._chart_type,bs=str(self._barspacing),
+                                                              id=image_id, nbs=str(self._num_bars_show),
+                                                              nbg=str(self._num_bar_gen))
+        # root directory for the file
+        file_root = 'inputs/raw/{p}/labels/{t}/{c}/{b}/{f}_labels.npz'.format(p=self._parentdir,t=self._ticker,
+                                                                              c=self._chart_type,b=self._bartime,f=filename)
+        save_labels(file_root, labels)
+        return labels
             
     def batch_screenshot(self, batch_size=10_000, csv_step=False):
         """
-        Takes screenshots of stock chart images in batches.
+        Takes screenshots of stock chart images in batches. The frames of the whole series are planned
+        up front, every batch renders a slice of the data with the lookback its first frame needs, so
+        no frame is lost at a batch boundary.
 
         Args:
-            batch_size (int): The number of stock chart images to process in each batch.
-        """
-        # loop through the data and take screenshots for each batch
-        for i in range(0, self._df['date'].size, batch_size):
-            # create a batch of the data
-            batch_df = self._df.iloc[i:i+batch_size].copy()
-            if i + batch_size >= self._df['date'].size:
-                batch_df = self._df.iloc[i:].copy()
-            self.create_chart_images(batch_df, csv_step=csv_step)
+            batch_size (int): The number of new rows rendered in each batch, rounded down to whole frames,
+                                as the batch_size of ParallelGenerator.
+        """
+        frames_per_batch = max(1, batch_size // self._num_bar_gen)
+        batches = plan_batches(self._df['date'].size, self._num_bars_show, self._num_bar_gen, frames_per_batch)
+        # image ids are the frame numbers in the series, so they line up with save_labels
+        for start, end, first_frame in batches:
+            self.create_chart_images(self._df.iloc[start:end], csv_step=csv_step, image_id=first_frame)
+        # a shared session is left open for its other users
+        if self._owns_session:
+            self.close()
         
\ No newline at end of file
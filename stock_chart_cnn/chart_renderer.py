@@ -0,0 +1,245 @@
+import io
+import numpy as np
+import pandas as pd
+from PIL import Image
+from .candle_window import CandleWindow
+
+class ChartRenderer:
+    # bumped whenever the drawing changes, so cached frames are rendered again
+    VERSION = 1
+
+    def __init__(self, chart_width=1200, chart_height=600, chart_type='candle', barspacing=1.5,
+                    background=(0, 0, 0), up_color=(39, 157, 130), down_color=(200, 97, 100),
+                    line_color=(214, 237, 255), margin=0.05):
+        """
+        Initialize a ChartRenderer object. Draws candle or line charts straight into a uint8 array
+        without a browser, so it can run on headless machines.
+
+        Args:
+            chart_width (int, optional): The width of the image in pixels. Defaults to 1200.
+            chart_height (int, optional): The height of the image in pixels. Defaults to 600.
+            chart_type (str, optional): The type of chart (candle, line). Defaults to 'candle'.
+            barspacing (float, optional): The gap in pixels between neighbouring candle bodies. Defaults to 1.5.
+            background (tuple, optional): The RGB background color. Defaults to black.
+            up_color (tuple, optional): The RGB color of rising candles. Defaults to the lightweight_charts green.
+            down_color (tuple, optional): The RGB color of falling candles. Defaults to the lightweight_charts red.
+            line_color (tuple, optional): The RGB color of the line chart. Defaults to the lightweight_charts line color.
+            margin (float, optional): The fraction of the height left empty above and below the prices. Defaults to 0.05.
+        """
+        if chart_type not in ('candle', 'line'):
+            raise ValueError(f'Unsupported chart type: {chart_type}')
+        self._chart_width = chart_width
+        self._chart_height = chart_height
+        self._chart_type = chart_type
+        self._barspacing = barspacing
+        self._background = np.array(background, dtype=np.uint8)
+        self._up_color = np.array(up_color, dtype=np.uint8)
+        self._down_color = np.array(down_color, dtype=np.uint8)
+        self._line_color = np.array(line_color, dtype=np.uint8)
+        self._margin = margin
+        # row coordinates reused by every frame
+        self._rows = np.arange(chart_height, dtype=np.float64)[:, None]
+
+    def _price_to_pixel(self, prices: np.ndarray, low: float, high: float):
+        """
+        Maps prices to pixel rows, highest price at the top of the image.
+
+        Args:
+            prices (np.ndarray): The prices to map.
+            low (float): The lowest price on screen.
+            high (float): The highest price on screen.
+
+        Returns:
+            np.ndarray: The pixel rows of the prices.
+        """
+        top = self._margin * (self._chart_height - 1)
+        span = (1 - 2 * self._margin) * (self._chart_height - 1)
+        price_range = high - low
+        if price_range <= 0:
+            # flat window, draw everything on the middle row
+            return np.full(prices.shape, (self._chart_height - 1) / 2)
+        return top + (high - prices) / price_range * span
+
+    def _column_bars(self, num_bars: int):
+        """
+        Assigns every pixel column to the bar drawn in it.
+
+        Args:
+            num_bars (int): The number of bars on screen.
+
+        Returns:
+            tuple: The bar index of every column, a mask of the columns inside a candle body
+                    and a mask of the columns holding a wick.
+        """
+        slot = self._chart_width / num_bars
+        cols = np.arange(self._chart_width) + 0.5
+        bar_idx = np.minimum((cols // slot).astype(np.int64), num_bars - 1)
+        # offset of the column from the centre of its bar
+        offset = np.abs(cols - (bar_idx + 0.5) * slot)
+        body_half = max(slot - self._barspacing, 1) / 2
+        body = offset <= body_half
+        wick = offset <= 0.5
+        return bar_idx, body, wick
+
+    def _render_candles(self, image: np.ndarray, ohlc: np.ndarray):
+        """
+        Draws candles into the image.
+
+        Args:
+            image (np.ndarray): The image to draw into.
+            ohlc (np.ndarray): The open, high, low, close prices of each bar.
+        """
+        opens, highs, lows, closes = ohlc.T
+        low, high = lows.min(), highs.max()
+        bar_idx, body, wick = self._column_bars(len(ohlc))
+        # pixel rows for every column
+        body_top = self._price_to_pixel(np.maximum(opens, closes), low, high)[bar_idx]
+        body_bottom = self._price_to_pixel(np.minimum(opens, closes), low, high)[bar_idx]
+        wick_top = self._price_to_pixel(highs, low, high)[bar_idx]
+        wick_bottom = self._price_to_pixel(lows, low, high)[bar_idx]
+        # rows covered by the body are always at least one pixel tall
+        in_body = (self._rows >= np.floor(body_top)) & (self._rows <= np.maximum(np.floor(body_bottom), np.floor(body_top)))
+        in_wick = (self._rows >= np.floor(wick_top)) & (self._rows <= np.floor(wick_bottom))
+        mask = (in_body & body) | (in_wick & wick)
+        # color each column by the direction of its bar
+        colors = np.where((closes >= opens)[bar_idx, None], self._up_color, self._down_color)
+        image[mask] = np.broadcast_to(colors, image.shape)[mask]
+
+    def _render_line(self, image: np.ndarray, ohlc: np.ndarray):
+        """
+        Draws a line through the closing prices into the image.
+
+        Args:
+            image (np.ndarray): The image to draw into.
+            ohlc (np.ndarray): The open, high, low, close prices of each bar.
+        """
+        closes = ohlc[:, 3]
+        slot = self._chart_width / len(closes)
+        # interpolate the closing price at every column
+        cols = np.arange(self._chart_width) + 0.5
+        centres = (np.arange(len(closes)) + 0.5) * slot
+        y = self._price_to_pixel(np.interp(cols, centres, closes), closes.min(), closes.max())
+        # connect each column to the previous one so steep moves have no holes
+        y_prev = np.concatenate([y[:1], y[:-1]])
+        top = np.floor(np.minimum(y, y_prev))
+        bottom = np.floor(np.maximum(y, y_prev))
+        mask = (self._rows >= top) & (self._rows <= bottom)
+        image[mask] = self._line_color
+
+    def render(self, ohlc):
+        """
+        Renders the bars into an image.
+
+        Args:
+            ohlc (np.ndarray or pd.DataFrame): The bars to draw, either an (N, 4) array of open, high, low, close
+                                                prices or a DataFrame with those columns.
+
+        Returns:
+            np.ndarray: A (chart_height, chart_width, 3) uint8 RGB image.
+        """
+        if isinstance(ohlc, pd.DataFrame):
+            ohlc = ohlc[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+        ohlc = np.asarray(ohlc, dtype=np.float64)
+        image = np.empty((self._chart_height, self._chart_width, 3), dtype=np.uint8)
+        image[:] = self._background
+        if len(ohlc) == 0:
+            return image
+        if self._chart_type == 'candle':
+            self._render_candles(image, ohlc)
+        else:
+            self._render_line(image, ohlc)
+        return image
+
+    @staticmethod
+    def encode(image: np.ndarray, format='PNG'):
+        """
+        Encodes a rendered image.
+
+        Args:
+            image (np.ndarray): The rendered image.
+            format (str, optional): The image format passed to Pillow. Defaults to 'PNG'.
+
+        Returns:
+            bytes: The encoded image data.
+        """
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format=format)
+        return buffer.getvalue()
+
+
+class RasterChart:
+    def __init__(self, renderer: ChartRenderer):
+        """
+        Initialize a RasterChart object. Mirrors the parts of the lightweight_charts Chart
+        interface used by ChartImage, drawing with a ChartRenderer instead of a webview.
+        Only the bars in view are kept, in a CandleWindow.
+
+        Args:
+            renderer (ChartRenderer): The renderer used to draw the frames.
+        """
+        self._renderer = renderer
+        self._window = CandleWindow(1)
+
+    def set(self, data: pd.DataFrame):
+        """
+        Replaces the data on the chart, the bars set are the bars in view.
+
+        Args:
+            data (pd.DataFrame): The bars with columns open, high, low, close.
+        """
+        ohlc = data[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+        self._window = CandleWindow(max(len(ohlc), 1))
+        self._window.extend(None, ohlc)
+
+    def update(self, series: pd.Series):
+        """
+        Appends a bar to the chart, the view scrolls to keep the same number of bars.
+
+        Args:
+            series (pd.Series): The bar with labels open, high, low, close.
+        """
+        self._window.append(None, (series['open'], series['high'], series['low'], series['close']))
+
+    def extend(self, ohlc: np.ndarray):
+        """
+        Appends bars to the chart in one step, without building a pd.Series for each.
+
+        Args:
+            ohlc (np.ndarray): The (N, 4) open, high, low, close prices of the bars.
+        """
+        self._window.extend(None, ohlc)
+
+    def fit(self):
+        """
+        Fits the current bars to the width of the chart. Later updates scroll the view
+        instead of squeezing more bars in, as lightweight_charts does.
+        """
+
+    def show(self):
+        """
+        Nothing to display for an offscreen chart.
+        """
+
+    def screenshot_array(self):
+        """
+        Renders the bars in view.
+
+        Returns:
+            np.ndarray: The rendered RGB image.
+        """
+        return self._renderer.render(self._window.ohlc)
+
+    def screenshot(self):
+        """
+        Renders the bars in view.
+
+        Returns:
+            bytes: The PNG encoded image, as returned by lightweight_charts.
+        """
+        return self._renderer.encode(self.screenshot_array())
+
+    def exit(self):
+        """
+        Releases the bars held by the chart.
+        """
+        self._window = CandleWindow(1)
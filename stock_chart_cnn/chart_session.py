@@ -0,0 +1,176 @@
+import queue
+import pandas as pd
+from contextlib import contextmanager
+from .metrics import Metrics
+
+class ChartSession:
+    def __init__(self, setup_chart, metrics=None):
+        """
+        Initialize a ChartSession object. Keeps one chart window warm so new data can be set and
+        captured without starting a new chart for every batch, and records the time spent in
+        each stage (set, update, screenshot, save).
+
+        Args:
+            setup_chart (callable): Creates the chart, ex: ChartImage._setup_chart. Called on first use.
+            metrics (Metrics, optional): Records the stage timings, can be shared with the rest of a run.
+                                            Defaults to a new Metrics object.
+        """
+        self._setup_chart = setup_chart
+        self._chart = None
+        self._shown = False
+        self.metrics = metrics or Metrics()
+
+    @property
+    def chart(self):
+        """
+        The chart of the session, created and shown on first use.
+        """
+        if self._chart is None:
+            self._chart = self._setup_chart()
+            self._shown = False
+        return self._chart
+
+    @property
+    def renders_arrays(self):
+        return hasattr(self.chart, 'screenshot_array')
+
+    def timer(self, stage: str):
+        """
+        Times a block of code and adds it to the stage totals.
+
+        Args:
+            stage (str): The name of the stage.
+        """
+        return self.metrics.timer(stage)
+
+    def set(self, data):
+        """
+        Replaces the data on the chart and fits it to the window.
+
+        Args:
+            data (pd.DataFrame): The bars to show.
+        """
+        chart = self.chart
+        with self.timer('set'):
+            chart.set(data)
+            # fit bars to the chart
+            chart.fit()
+            # the window only has to be shown once
+            if not self._shown:
+                chart.show()
+                self._shown = True
+
+    def update(self, series):
+        """
+        Adds a bar to the chart.
+
+        Args:
+            series (pd.Series): The bar to add.
+        """
+        with self.timer('update'):
+            self.chart.update(series)
+
+    def extend(self, dates, ohlc):
+        """
+        Adds bars to the chart. Charts with an extend method take the arrays directly, others get
+        one pd.Series per bar.
+
+        Args:
+            dates (np.ndarray): The dates of the bars.
+            ohlc (np.ndarray): The (N, 4) open, high, low, close prices of the bars.
+        """
+        chart = self.chart
+        with self.timer('update'):
+            if hasattr(chart, 'extend'):
+                chart.extend(ohlc)
+                return
+            for date, row in zip(dates, ohlc):
+                chart.update(pd.Series({'date': date, 'open': row[0], 'high': row[1], 'low': row[2], 'close': row[3]}))
+
+    def screenshot(self):
+        """
+        Takes a screenshot of the chart.
+
+        Returns:
+            bytes: The screenshot image data.
+        """
+        with self.timer('screenshot'):
+            return self.chart.screenshot()
+
+    def screenshot_array(self):
+        """
+        Renders the chart to an array, only supported by charts with a screenshot_array method.
+
+        Returns:
+            np.ndarray: The rendered image.
+        """
+        with self.timer('screenshot'):
+            return self.chart.screenshot_array()
+
+    def report(self):
+        """
+        Summarises the time spent in each stage.
+
+        Returns:
+            dict: The total seconds, number of calls and mean milliseconds per call of each stage.
+        """
+        return self.metrics.timings()
+
+    def close(self):
+        """
+        Exits the chart, a new one is created if the session is used again.
+        """
+        if self._chart is not None:
+            self._chart.exit()
+            self._chart = None
+
+
+class ChartSessionPool:
+    def __init__(self, setup_chart, size=1):
+        """
+        Initialize a ChartSessionPool object. Hands out a fixed number of warm chart sessions.
+
+        Args:
+            setup_chart (callable): Creates the chart of each session.
+            size (int, optional): The number of sessions in the pool. Defaults to 1.
+        """
+        self._sessions = [ChartSession(setup_chart) for _ in range(size)]
+        self._free = queue.Queue()
+        for session in self._sessions:
+            self._free.put(session)
+
+    @contextmanager
+    def session(self):
+        """
+        Borrows a session from the pool, waiting for one to be returned if all are in use.
+
+        Yields:
+            ChartSession: The borrowed session.
+        """
+        session = self._free.get()
+        try:
+            yield session
+        finally:
+            self._free.put(session)
+
+    def report(self):
+        """
+        Sums the stage timings of every session in the pool.
+
+        Returns:
+            dict: The total seconds, number of calls and mean milliseconds per call of each stage.
+        """
+        totals = {}
+        for session in self._sessions:
+            for stage, stats in session.report().items():
+                seconds, count = totals.get(stage, (0.0, 0))
+                totals[stage] = (seconds + stats['seconds'], count + stats['count'])
+        return {stage: {'seconds': total, 'count': count, 'mean_ms': 1000 * total / count}
+                for stage, (total, count) in totals.items()}
+
+    def close(self):
+        """
+        Exits the charts of every session.
+        """
+        for session in self._sessions:
+            session.close()
@@ -1,27 +1,61 @@
 import requests
+import numpy as np
 import pandas as pd
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from .metrics import Metrics
+from .rate_limiter import RateLimiter
+from .resample import bartime_to_seconds, dates_to_epoch, resample_candles
+from .validation import repair_candles, validate_candles
 
 class CoinbaseWrapper(object):
-    def __init__(self):
+    def __init__(self, base_url='https://api.pro.coinbase.com', requests_per_second=10, max_retries=5,
+                    pool_size=10, store=None, cache=None, metrics=None):
         """
         Initializes a new instance of the CoinbaseWrapper class.
 
+        Args:
+            base_url (str, optional): The root of the candles endpoint, can point at a local stub server.
+                                        Defaults to 'https://api.pro.coinbase.com'.
+            requests_per_second (float, optional): The request budget shared by all fetching threads. Defaults to 10.
+            max_retries (int, optional): The number of retries on 429/5xx responses or connection errors. Defaults to 5.
+            pool_size (int, optional): The number of pooled connections kept open. Defaults to 10.
+            store (CandleStore, optional): A columnar store that saved data is also written to. Defaults to None.
+            cache (ResponseCache, optional): Keeps the raw candle pages on disk, pages already cached are not
+                                                requested again. Defaults to None.
+            metrics (Metrics, optional): Records the time spent fetching, parsing and resampling and the request
+                                            counts. Defaults to a new Metrics object.
+
         Returns:
             None
         """
         self._init_logger()
         self.bartimes_convert = {'1_min': 60, '5_minute': 300, '15_minute': 900, 
                                  '1_hour': 3600, '6_hour': 21600, '1_day': 86400}
+        self._base_url = base_url.rstrip('/')
+        self._max_retries = max_retries
+        self._store = store
+        self._cache = cache
+        self.metrics = metrics or Metrics()
+        self._rate_limiter = RateLimiter(requests_per_second)
+        # one session so connections are reused between requests
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
 
     def _init_logger(self):
         """
         Initializes the logger for the CoinbaseWrapper class.
 
         This method sets up a logger object with a stream handler and a specific formatter.
-        The logger is then configured to log messages at the DEBUG level.
+        The logger is then configured to log messages at the DEBUG level. The handler is only
+        added once, so later instances do not repeat every message.
 
         Args:
             None
@@ -30,11 +64,12 @@ class CoinbaseWrapper(object):
             None
         """
         self._logger = logging.getLogger(__name__)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
-        handler.setFormatter(formatter)
-        self._logger.addHandler(handler)
-        self._logger.setLevel(logging.DEBUG)
+        if not self._logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
+            handler.setFormatter(formatter)
+            self._logger.addHandler(handler)
+            self._logger.setLevel(logging.DEBUG)
 
     @staticmethod
     def _filepath_maker(ticker: str, bartime: str):
@@ -51,18 +86,21 @@ class CoinbaseWrapper(object):
             start (int): The start time for the candlestick data in Unix timestamp format.
 
         Returns:
-            pandas.DataFrame or None: A DataFrame containing the fetched candlestick data, or None if the request fails.
+            tuple: The start timestamp for the next request and a DataFrame containing the fetched candlestick data,
+                    or (None, None) if the request fails.
         """
         start, candles_df = self._fetch_data(ticker, '1_hour', start)
         if candles_df is not None:
-            df = self._convert_4hour_data(candles_df)
+            with self.metrics.timer('resample'):
+                df = self._convert_4hour_data(candles_df)
             return start, df
-        return None
+        return None, None
     
     @staticmethod
     def _convert_4hour_data(candles_df: pd.DataFrame):
         """
-        Converts the given DataFrame of candlestick data into 4-hour candles.
+        Converts the given DataFrame of 1-hour candlestick data into 4-hour candles. Buckets cut
+        off at the edges of the page are dropped.
 
         Args:
             candles_df (pd.DataFrame): The DataFrame containing candlestick data.
@@ -70,41 +108,7 @@ class CoinbaseWrapper(object):
         Returns:
             pd.DataFrame: The DataFrame containing 4-hour candles with columns ['date', 'low', 'high', 'open', 'close', 'volume'].
         """
-        # flip the indexing for traversing
-        candles_df.reset_index(inplace=True)
-
-        # start and end index for 4 hour candles
-        start, end = None, None
-        four_hour_candles = []
-        for idx, row in candles_df.iterrows():
-            temp_date = datetime.strptime(row['date'], '%Y-%m-%d %H:%M:%S')
-            
-            if len(four_hour_candles) >= 75: # 300 hours of data max returned from API 4 * 75 = 300
-                break # breaks out before it throws error for index not found
-            if (temp_date.hour % 4 == 0) and end is None:
-                end = idx+1
-            elif (temp_date.hour % 4 == 0) and start is None:
-                start = idx+1
-                date = candles_df.at[end-1,'date']
-                # minimum low value in period
-                low = min(candles_df.loc[end:start,'low'].values)
-                # maximum high value in period
-                high = max(candles_df.loc[end:start,'high'].values)
-                # the opening price at start
-                open = candles_df.at[start-1,'open']
-                # the closing price at end
-                close = candles_df.at[end,'close']
-                # the total volume
-                volume = sum(candles_df.loc[end:start,'volume'].values)
-                # add the 4 hour candle to the list
-                four_hour_candles.append([date,low,high,open,close,volume])
-                # reset index's
-                start, end = None, start
-        
-        # create a new dataframe and set the index
-        four_hour_df = pd.DataFrame(four_hour_candles, columns=['date','low','high','open','close','volume'])
-        four_hour_df.set_index('date', inplace=True)
-        return four_hour_df
+        return resample_candles(candles_df, '4_hour', base_bartime='1_hour', trim_partial=True)
 
     def _fetch_data(self, ticker: str, bartime: str, start: int):
         """
@@ -117,8 +121,8 @@ class CoinbaseWrapper(object):
 
         Returns:
             tuple: A tuple containing the start timestamp for the next request and a DataFrame
-                    containing the candlestick data. If the request fails or the data is empty,
-                    None is returned.
+                    containing the candlestick data, empty when the api has no candles in the window.
+                    If the request fails, (None, None) is returned.
         """
         if bartime == '4_hour':
             # get the 4 hour data
@@ -128,49 +132,502 @@ class CoinbaseWrapper(object):
         bartime = self.bartimes_convert[bartime]
         # set the end time
         end = start + bartime * 300 # the limit of coinbase is 300 candles
-        # format the ticker
-        ticker = ticker.upper().replace('USD','-USD')
         
-        url = 'https://api.pro.coinbase.com/products/{t}/candles'.format(t=ticker)
+        candles = self._request_candles(ticker, bartime, start, end)
         
-        response = requests.get(url, params={'start': start, 'end': end, 'granularity': bartime})
-        
-        if response.status_code == 200:
+        if candles is not None:
+            # create dataframe
+            with self.metrics.timer('parse'):
+                candles_df = self._candles_to_df(candles)
+            # set the start of the next request, past the window when it has no candles
+            start = candles[-1][0] if candles else end
+            return start, candles_df
+        return None, None
+
+    def _request(self, url: str, params=None):
+        """
+        Makes a GET request over the shared session within the request budget, retrying with
+        exponential backoff on 429/5xx responses and connection errors, timeouts and broken responses.
+
+        Args:
+            url (str): The url to request.
+            params (dict, optional): The query parameters.
+
+        Returns:
+            requests.Response or None: The last response, or None if the server could not be reached.
+        """
+        response = None
+        for attempt in range(self._max_retries + 1):
+            with self.metrics.timer('rate_limit'):
+                self._rate_limiter.acquire()
+            self.metrics.count('requests')
+            try:
+                with self.metrics.timer('fetch'):
+                    response = self._session.get(url, params=params, timeout=30)
+            except requests.RequestException:
+                # also read timeouts and responses cut off mid transfer, which are not connection errors
+                self.metrics.count('connection_errors')
+                response = None
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                self.metrics.count('http_{s}'.format(s=response.status_code))
+            if attempt < self._max_retries:
+                self.metrics.count('retries')
+                # honour the server's wait time when it sends one
+                retry_after = response.headers.get('Retry-After') if response is not None else None
+                wait = 0.5 * 2 ** attempt
+                try:
+                    wait = float(retry_after) if retry_after else wait
+                except ValueError:
+                    # an HTTP date, the backoff is used instead
+                    pass
+                self._logger.debug(f"Retrying {url} in {wait:.1f}s.")
+                time.sleep(wait)
+        return response
+
+    def _request_candles(self, ticker: str, granularity: int, start: int, end: int):
+        """
+        Requests the candles between two timestamps from the Coinbase API, or reads them from the
+        response cache. Only pages of closed candles are cached, the latest page can still grow.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            granularity (int): The bartime in seconds.
+            start (int): The start timestamp.
+            end (int): The end timestamp, at most 300 candles after start.
+
+        Returns:
+            list or None: The candles as [time, low, high, open, close, volume] lists oldest first,
+                            or None if the request fails.
+        """
+        # format the ticker
+        ticker = ticker.upper().replace('USD','-USD')
+        if self._cache is not None:
+            candles = self._cache.get(ticker, granularity, start, end)
+            if candles is not None:
+                self.metrics.count('cache_hits')
+                # reverse the ordering
+                candles.reverse()
+                return candles
+        url = '{base}/products/{t}/candles'.format(base=self._base_url, t=ticker)
+        response = self._request(url, params={'start': start, 'end': end, 'granularity': granularity})
+        if response is not None and response.status_code == 200:
             candles = response.json()
-            
             if candles is not None:
+                if self._cache is not None and end + granularity <= time.time():
+                    self._cache.put(ticker, granularity, start, end, candles)
                 # reverse the ordering
                 candles.reverse()
-                # create dataframe
-                candles_df = pd.DataFrame(candles, columns=['date','low','high','open','close','volume'])
-                # set the start of the next request
-                start = candles_df['date'].iloc[-1]
-                # convert the the timestamp to UTC (avoid overlapp with daylight savings time)
-                convert_date = lambda x: datetime.fromtimestamp(x , timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-                candles_df['date'] = candles_df['date'].apply(convert_date)
-                candles_df.set_index('date', inplace=True)
-
-                return start, candles_df
-        return None, None
+                return candles
+        return None
+
+    @staticmethod
+    def _candles_to_df(candles: list):
+        """
+        Creates a DataFrame from the candles returned by the API.
+
+        Args:
+            candles (list): The candles as [time, low, high, open, close, volume] lists.
+
+        Returns:
+            pd.DataFrame: The candles indexed by UTC date strings.
+        """
+        candles_df = pd.DataFrame(candles, columns=['date','low','high','open','close','volume'])
+        # convert the the timestamp to UTC (avoid overlapp with daylight savings time)
+        convert_date = lambda x: datetime.fromtimestamp(x , timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        candles_df['date'] = candles_df['date'].apply(convert_date)
+        candles_df.set_index('date', inplace=True)
+        return candles_df
+
+    @staticmethod
+    def _fetch_end(bartime: str, end: int):
+        """
+        Returns the last timestamp to fetch for a range ending at end. A 4 hour bar is built from the
+        1 hour candles up to 3 hours after it opens, so a bar opening at end needs them too.
+
+        Args:
+            bartime (str): The bartime interval of the series.
+            end (int): The end timestamp.
+
+        Returns:
+            int: The end timestamp of the fetched candles.
+        """
+        if bartime == '4_hour':
+            return end + bartime_to_seconds('4_hour') - bartime_to_seconds('1_hour')
+        return end
+
+    def _date_windows(self, bartime: str, start: int, end: int):
+        """
+        Splits a date range into the 300 candle windows of single requests.
+
+        Args:
+            bartime (str): The bartime interval for the candles.
+            start (int): The start timestamp.
+            end (int): The end timestamp.
+
+        Returns:
+            list: The (start, end) timestamps of each request.
+        """
+        step = self.bartimes_convert[bartime] * 300
+        return [(s, min(s + step, end)) for s in range(start, max(end, start + 1), step)]
+
+    def _get_data_concurrent(self, ticker: str, bartime: str, start: int, end: int, workers: int):
+        """
+        Fetches every window of a date range concurrently and reassembles them in order.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            start (int): The start timestamp.
+            end (int): The end timestamp.
+            workers (int): The number of fetching threads.
+
+        Returns:
+            pd.DataFrame or None: The candles, or None if any window fails.
+        """
+        # 4 hour candles are built from the 1 hour candles
+        fetch_bartime = '1_hour' if bartime == '4_hour' else bartime
+        granularity = self.bartimes_convert[fetch_bartime]
+        windows = self._date_windows(fetch_bartime, start, self._fetch_end(bartime, end))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map keeps the pages in window order
+            pages = list(executor.map(lambda w: self._request_candles(ticker, granularity, *w), windows))
+        df = self._assemble_pages(bartime, pages, start, end)
+        return df if df is None else df[dates_to_epoch(df.index) <= end]
+
+    def _resample_range(self, candles_df: pd.DataFrame, start: int, end: int):
+        """
+        Resamples the 1 hour candles of a range, fetched through end + 3h, into the 4 hour bars opening
+        between start and end. Only the bar cut by the start of the range is dropped, a bar the exchange
+        has some 1 hour candles missing for is built from the others, as in a whole series.
+
+        Args:
+            candles_df (pd.DataFrame): The 1 hour candles indexed by date.
+            start (int): The start timestamp of the range.
+            end (int): The end timestamp of the range.
+
+        Returns:
+            pd.DataFrame: The 4 hour candles indexed by date.
+        """
+        with self.metrics.timer('resample'):
+            df = resample_candles(candles_df, '4_hour')
+        epoch = dates_to_epoch(df.index)
+        return df[(epoch >= start) & (epoch <= end)]
+
+    def _assemble_pages(self, bartime: str, pages: list, start: int, end: int):
+        """
+        Joins the pages of a date range into one DataFrame.
+
+        Args:
+            bartime (str): The bartime interval of the series, 4_hour pages hold 1 hour candles.
+            pages (list): The candles of each window in window order, None for failed windows.
+            start (int): The start timestamp of the range.
+            end (int): The end timestamp of the range.
+
+        Returns:
+            pd.DataFrame or None: The candles, or None if any window failed.
+        """
+        if any(page is None for page in pages):
+            return None
+        with self.metrics.timer('parse'):
+            df = self._candles_to_df([candle for page in pages for candle in page])
+            # the api includes the end candle, so neighbouring windows overlap by one
+            df = df[~df.index.duplicated(keep='first')]
+        if bartime == '4_hour':
+            df = self._resample_range(df, start, end)
+        return df
+
+    def download_all(self, tickers: list, bartimes: list, start: int, end: int, workers=8):
+        """
+        Downloads and saves every (ticker, bartime) series between two timestamps. The windows of all
+        series are scheduled on one pool of threads sharing the pooled session and the request budget.
+        With a response cache an interrupted download only requests the pages it is missing when run
+        again, a series is saved once all of its pages are fetched.
+
+        Args:
+            tickers (list): The ticker symbols, expects form ex: btcusd.
+            bartimes (list): The bartime intervals.
+            start (int): The start timestamp.
+            end (int): The end timestamp.
+            workers (int, optional): The number of requests made concurrently. Defaults to 8.
+
+        Returns:
+            dict: The number of candles saved for each (ticker, bartime), 0 if the series failed.
+        """
+        # 4 hour candles are built from the 1 hour candles, so they share the pages of the 1 hour series
+        groups = {}
+        for ticker in tickers:
+            for bartime in bartimes:
+                fetch_bartime = '1_hour' if bartime == '4_hour' else bartime
+                groups.setdefault((ticker, fetch_bartime), []).append(bartime)
+        # the pages of a group run far enough for the 4 hour bar opening at end
+        windows = {group: self._date_windows(group[1], start, max(self._fetch_end(b, end) for b in groups[group]))
+                   for group in groups}
+        pages = {group: [None] * len(windows[group]) for group in groups}
+        remaining = {group: len(windows[group]) for group in groups}
+
+        saved = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for ticker, fetch_bartime in groups:
+                granularity = self.bartimes_convert[fetch_bartime]
+                for i, window in enumerate(windows[ticker, fetch_bartime]):
+                    future = executor.submit(self._request_candles, ticker, granularity, *window)
+                    futures[future] = (ticker, fetch_bartime, i)
+            for future in tqdm(as_completed(futures), total=len(futures), desc='Pages: '):
+                ticker, fetch_bartime, i = futures[future]
+                group = (ticker, fetch_bartime)
+                pages[group][i] = future.result()
+                remaining[group] -= 1
+                if remaining[group]:
+                    continue
+                # every page of the series is in, save it and free the pages
+                for bartime in groups[group]:
+                    df = self._assemble_pages(bartime, pages[group], start, end)
+                    if df is None:
+                        self._logger.error(f"Failed to fetch {ticker} {bartime} candles data.")
+                        saved[ticker, bartime] = 0
+                        continue
+                    df = df[dates_to_epoch(df.index) <= end]
+                    self._save(ticker, bartime, df)
+                    saved[ticker, bartime] = len(df)
+                del pages[group]
+        return saved
         
-    def get_data_in_date_range(self, ticker, bartime, start, end, save=False):
-        start, df = self._fetch_data(ticker, bartime, start)    
+    def get_data_in_date_range(self, ticker, bartime, start, end, save=False, workers=1):
+        """
+        Fetches the candlestick data between two timestamps.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            start (int): The start timestamp.
+            end (int): The end timestamp.
+            save (bool, optional): Whether to save the data to the formatted csv file. Defaults to False.
+            workers (int, optional): The number of requests made concurrently. With more than one worker all
+                                        windows are computed up front and fetched in parallel. Defaults to 1.
+
+        Returns:
+            pd.DataFrame or None: The candles, or None if the data could not be fetched.
+        """
+        if workers > 1:
+            df = self._get_data_concurrent(ticker, bartime, start, end, workers)
+            if df is None:
+                self._logger.error(f"Failed to fetch {ticker} {bartime} candles data.")
+                return None
+            if save:
+                self._save(ticker, bartime, df)
+            return df
+        # 4 hour candles are resampled once from all the 1 hour pages, resampling each page would drop
+        # the bucket cut at every page boundary
+        fetch_bartime = '1_hour' if bartime == '4_hour' else bartime
+        fetch_end = self._fetch_end(bartime, end)
+        first = start
+        start, df = self._fetch_data(ticker, fetch_bartime, start)
         # the start date or end date are invalid
         if start is None:
             self._logger.error(f"Failed to fetch {ticker} {bartime} candles data.")
             return None
+        # collect the pages and concatenate them once
+        pages = [df]
         # loop through the data
-        while start < end:
-            start, temp = self._fetch_data(ticker, bartime, start)
-            df = pd.concat([df, temp])
-            # reached the end of the data
+        while start < fetch_end:
+            start, temp = self._fetch_data(ticker, fetch_bartime, start)
+            # a failed page would leave a hole, fail like the concurrent path does
             if start is None:
-                break
+                self._logger.error(f"Failed to fetch {ticker} {bartime} candles data.")
+                return None
+            pages.append(temp)
+        df = pd.concat(pages)
+        # each page starts at the last candle of the one before, and the last page can run past the end
+        df = df[~df.index.duplicated(keep='first')].sort_index()
+        df = df[dates_to_epoch(df.index) <= fetch_end]
+        if bartime == '4_hour':
+            df = self._resample_range(df, first, end)
         # save the data to a csv file
         if save:
-            df.to_csv(self._filepath_maker(ticker, bartime))
+            self._save(ticker, bartime, df)
         return df
+
+    def _save(self, ticker: str, bartime: str, df: pd.DataFrame):
+        """
+        Saves the data to the formatted csv file, and to the columnar store if one is set.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            df (pd.DataFrame): The candles indexed by date.
+        """
+        report = validate_candles(df, bartime)
+        if not report['ok']:
+            self._logger.warning(f"{ticker} {bartime} candles data has problems: {self._summary(report)}")
+        with self.metrics.timer('write'):
+            df.to_csv(self._filepath_maker(ticker, bartime))
+            if self._store is not None:
+                self._store.write(ticker, bartime, df)
+
+    @staticmethod
+    def _summary(report: dict):
+        """
+        Formats the problems of a validation report on one line.
+
+        Args:
+            report (dict): The report returned by validate_candles.
+
+        Returns:
+            str: The problems found and their counts.
+        """
+        return ', '.join(f'{name}={value}' for name, value in report.items()
+                         if name not in ('rows', 'ok', 'gap_ranges') and value)
+
+    def repair(self, ticker: str, bartime: str, ohlc='clip', refetch=True, fill=None, workers=1):
+        """
+        Validates the formatted csv for a ticker and bartime and repairs it: duplicated and out of order
+        rows and invalid candles are fixed in place, missing intervals are refetched, and the ones the
+        api has no candles for can be forward filled.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            ohlc (str, optional): What to do with invalid candles (clip, drop), see repair_candles. Defaults to 'clip'.
+            refetch (bool, optional): Whether to refetch the missing intervals. Defaults to True.
+            fill (str, optional): 'ffill' fills the intervals still missing with flagged flat candles.
+                                    Defaults to None.
+            workers (int, optional): The number of requests made concurrently. Defaults to 1.
+
+        Returns:
+            tuple: The validation reports of the series before and after the repair.
+        """
+        filepath = self._filepath_maker(ticker, bartime)
+        df = pd.read_csv(filepath)
+        before = validate_candles(df, bartime)
+        self._logger.debug(f"Validated {ticker} {bartime} candles data: {self._summary(before) or 'ok'}")
+        # bars forward filled by an earlier repair are refetched like the gaps
+        num_filled = int(df['filled'].astype(bool).sum()) if 'filled' in df.columns else 0
+        if before['ok'] and not (refetch and num_filled):
+            return before, before
+        if before['duplicates'] or before['out_of_order'] or before['nan_rows'] or before['ohlc_errors']:
+            df = repair_candles(df, bartime, ohlc=ohlc)
+            self._save(ticker, bartime, df.set_index('date'))
+        if refetch and (before['gaps'] or num_filled):
+            # fills the holes between the first and last stored candles
+            last = int(dates_to_epoch(df['date']).max())
+            self.sync(ticker, bartime, end=last, backfill=True, workers=workers)
+            df = pd.read_csv(filepath)
+        if fill is not None:
+            df = repair_candles(df, bartime, ohlc=None, fill=fill)
+            self._save(ticker, bartime, df.set_index('date'))
+        after = validate_candles(df, bartime)
+        self._logger.debug(f"Repaired {ticker} {bartime} candles data: {self._summary(after) or 'ok'}")
+        return before, after
     
+    def _fetch_range(self, ticker: str, bartime: str, start: int, end: int, workers: int):
+        """
+        Fetches the candles between two timestamps, dropping any candles the API returns outside of them.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            start (int): The first timestamp to keep.
+            end (int): The last timestamp to keep.
+            workers (int): The number of requests made concurrently.
+
+        Returns:
+            pd.DataFrame or None: The candles, or None if the data could not be fetched.
+        """
+        df = self.get_data_in_date_range(ticker, bartime, start, end, workers=workers)
+        if df is None or df.empty:
+            return df
+        epoch = dates_to_epoch(df.index)
+        return df[(epoch >= start) & (epoch <= end)]
+
+    def sync(self, ticker: str, bartime: str, start=None, end=None, backfill=False, workers=1):
+        """
+        Brings the formatted csv for a ticker and bartime up to date. Only the candles after the last
+        stored timestamp are fetched and appended to the file, holes inside the stored series,
+        and the bars forward filled by repair, are refetched when backfill is set. Most holes are
+        intervals the exchange has no candles for, so a periodic refresh leaves backfill off and
+        repair sets it.
+
+        Args:
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            start (int, optional): The start timestamp, only used when the file does not exist yet.
+            end (int, optional): The end timestamp. Defaults to the last closed candle.
+            backfill (bool, optional): Whether to refetch missing intervals inside the stored series. Defaults to False.
+            workers (int, optional): The number of requests made concurrently. Defaults to 1.
+
+        Returns:
+            int: The number of candles added to the file.
+        """
+        filepath = self._filepath_maker(ticker, bartime)
+        seconds = bartime_to_seconds(bartime)
+        if end is None:
+            # the candle still being built is left for the next sync
+            end = int(time.time()) // seconds * seconds - seconds
+        if not filepath.exists():
+            if start is None:
+                raise ValueError(f'No stored data for {ticker} {bartime}, a start timestamp is required')
+            df = self.get_data_in_date_range(ticker, bartime, start, end, save=True, workers=workers)
+            return 0 if df is None else len(df)
+
+        # only the dates are needed to find what is missing
+        stored = pd.read_csv(filepath, nrows=0).columns.tolist()
+        known = pd.read_csv(filepath, usecols=[c for c in ['date', 'filled'] if c in stored])
+        last = int(dates_to_epoch(known['date']).max())
+        if 'filled' in stored:
+            # bars forward filled by repair count as missing, so they are refetched
+            known = known[~known['filled'].astype(bool)]
+        epoch = np.sort(dates_to_epoch(known['date']))
+        frames = []
+        # fetch the tail after the last stored candle
+        if last + seconds <= end:
+            tail = self._fetch_range(ticker, bartime, last + seconds, end, workers)
+            if tail is None:
+                self._logger.error(f"Failed to sync {ticker} {bartime} candles data.")
+            elif not tail.empty:
+                frames.append(tail)
+        # fetch the holes between stored candles
+        holes = []
+        if backfill:
+            gaps = np.flatnonzero(np.diff(epoch) > seconds)
+            holes = [(int(epoch[g]) + seconds, int(epoch[g + 1]) - seconds) for g in gaps]
+            for hole_start, hole_end in holes:
+                filled = self._fetch_range(ticker, bartime, hole_start, hole_end, workers)
+                if filled is not None and not filled.empty:
+                    frames.append(filled)
+            self._logger.debug(f"Found {len(holes)} gaps in {ticker} {bartime} candles data.")
+        if not frames:
+            return 0
+
+        new = pd.concat(frames)
+        new = new[~new.index.duplicated(keep='first')]
+        # drop the candles that are already stored
+        new = new[~np.isin(dates_to_epoch(new.index), epoch)].sort_index()
+        new = new.reset_index().reindex(columns=stored)
+        if 'filled' in stored:
+            new['filled'] = False
+        if new.empty:
+            return 0
+        if dates_to_epoch(new['date']).min() > last:
+            # only new candles at the end, append them in place
+            new.to_csv(filepath, mode='a', header=False, index=False)
+            if self._store is not None and self._store.exists(ticker, bartime):
+                self._store.append(ticker, bartime, new)
+            elif self._store is not None:
+                # the store does not hold the series yet, it is seeded with the whole file, not just the new rows
+                self._store.from_csv(filepath, ticker, bartime)
+        else:
+            # holes were filled, rewrite the file in order, the fetched candles replace forward filled bars
+            df = pd.read_csv(filepath)
+            df = pd.concat([df[~df['date'].isin(new['date'])], new]).sort_values('date')
+            df.to_csv(filepath, index=False)
+            if self._store is not None:
+                self._store.write(ticker, bartime, df)
+        self._logger.debug(f"Added {len(new)} candles to {filepath}.")
+        return len(new)
+
     def get_current_price(self, ticker: str):
         """
         Retrieves the current price of the given currency from the Coinbase API.
@@ -188,9 +645,9 @@ class CoinbaseWrapper(object):
         # Coinbase API endpoint for currency price
         url = "https://api.coinbase.com/v2/prices/{t}/spot".format(t=ticker)
         
-        response = requests.get(url)
+        response = self._request(url)
         
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             price = response.json()
             
             if price is not None:
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .chart_renderer import ChartRenderer
+
+try:
+    import torch
+    from torch.utils.data import DataLoader, Dataset
+except ImportError:
+    # the dataset still returns numpy arrays without torch
+    torch = None
+    Dataset = object
+
+
+class ChartDataset(Dataset):
+    def __init__(self, series: list, parentdir='crypto', chart_type='candle', barspacing=1.5, num_bars_show=60,
+                    num_bar_gen=5, horizon=5, chart_width=250, chart_height=250, transform=None,
+                    cache_size=1024, store=None):
+        """
+        Initialize a ChartDataset object. Renders chart frames on demand from the candle data,
+        so the chart settings can change without regenerating an image dataset.
+
+        Args:
+            series (list): The (ticker, bartime) pairs to draw frames from.
+            parentdir (str, optional): The parent directory (crypto, stocks). Defaults to 'crypto'.
+            chart_type (str, optional): The type of chart (candle, line). Defaults to 'candle'.
+            barspacing (float, optional): The gap in pixels between candle bodies. Defaults to 1.5.
+            num_bars_show (int, optional): The number of bars in each frame. Defaults to 60.
+            num_bar_gen (int, optional): The number of bars between consecutive frames. Defaults to 5.
+            horizon (int, optional): The number of bars after the frame used as labels. Defaults to 5.
+            chart_width (int, optional): The width of the frames. Defaults to 250.
+            chart_height (int, optional): The height of the frames. Defaults to 250.
+            transform (callable, optional): Applied to each (H, W, C) frame after the cache, ex: a mask. Defaults to None.
+            cache_size (int, optional): The number of rendered frames kept in each process. Defaults to 1024.
+            store (CandleStore, optional): Reads the series from a columnar store instead of the formatted csv.
+        """
+        self._series = series
+        self._num_bars_show = num_bars_show
+        self._num_bar_gen = num_bar_gen
+        self._horizon = horizon
+        self._transform = transform
+        self._renderer = ChartRenderer(chart_width=chart_width, chart_height=chart_height,
+                                       chart_type=chart_type, barspacing=barspacing)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+        self._ohlc = []
+        counts = []
+        for ticker, bartime in series:
+            if store is not None and store.exists(ticker, bartime):
+                data = store.read_df(ticker, bartime)
+            else:
+                data = pd.read_csv('data/{p}/formatted/{t}/{t}_{b}_data_formatted.csv'.format(p=parentdir,
+                                                                                              t=ticker, b=bartime))
+            ohlc = data[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+            self._ohlc.append(ohlc)
+            # frames need num_bars_show bars on screen and horizon bars after them
+            counts.append(max(0, (len(ohlc) - num_bars_show - horizon) // num_bar_gen + 1))
+        # first dataset index of each series
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def window(self, idx: int):
+        """
+        Maps a dataset index to its frame window.
+
+        Args:
+            idx (int): The dataset index.
+
+        Returns:
+            tuple: The series index and the start and end rows of the frame.
+        """
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'Index {idx} out of range for {len(self)} frames')
+        series_idx = int(np.searchsorted(self._offsets, idx, side='right')) - 1
+        start = (idx - int(self._offsets[series_idx])) * self._num_bar_gen
+        return series_idx, start, start + self._num_bars_show
+
+    def _render(self, series_idx: int, start: int, end: int):
+        """
+        Renders a frame, reusing it from the LRU cache when it was rendered recently.
+
+        Args:
+            series_idx (int): The series index.
+            start (int): The first row on screen.
+            end (int): The row after the last row on screen.
+
+        Returns:
+            np.ndarray: The (H, W, 3) uint8 frame.
+        """
+        key = (series_idx, start)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        frame = self._renderer.render(self._ohlc[series_idx][start:end])
+        self._cache[key] = frame
+        if len(self._cache) > self._cache_size:
+            # drop the least recently used frame
+            self._cache.popitem(last=False)
+        return frame
+
+    def labels(self, series_idx: int, end: int):
+        """
+        Computes the labels of a frame, the returns of the next horizon closes relative to the last close on screen.
+
+        Args:
+            series_idx (int): The series index.
+            end (int): The row after the last row on screen.
+
+        Returns:
+            np.ndarray: The float32 returns.
+        """
+        closes = self._ohlc[series_idx][:, 3]
+        return (closes[end:end + self._horizon] / closes[end - 1] - 1).astype(np.float32)
+
+    def __getitem__(self, idx: int):
+        """
+        Renders a frame and its labels.
+
+        Args:
+            idx (int): The dataset index.
+
+        Returns:
+            tuple: The frame and labels, as a (3, H, W) float tensor in [0, 1] and a tensor when torch is
+                    installed, otherwise as numpy arrays.
+        """
+        series_idx, start, end = self.window(idx)
+        frame = self._render(series_idx, start, end)
+        if self._transform is not None:
+            frame = self._transform(frame)
+        labels = self.labels(series_idx, end)
+        if torch is None:
+            return frame, labels
+        image = torch.from_numpy(np.ascontiguousarray(frame)).permute(2, 0, 1).float().div_(255)
+        return image, torch.from_numpy(labels)
+
+    def loader(self, batch_size=64, shuffle=True, num_workers=4, prefetch_factor=2, **kwargs):
+        """
+        Creates a DataLoader rendering the frames in worker processes ahead of the training loop.
+
+        Args:
+            batch_size (int, optional): The number of frames per batch. Defaults to 64.
+            shuffle (bool, optional): Whether to shuffle the frames. Defaults to True.
+            num_workers (int, optional): The number of rendering processes. Defaults to 4.
+            prefetch_factor (int, optional): The number of batches each worker renders ahead. Defaults to 2.
+            **kwargs: Passed on to the DataLoader.
+
+        Returns:
+            DataLoader: The data loader.
+        """
+        if torch is None:
+            raise ImportError('torch is required to create a DataLoader')
+        if num_workers > 0:
+            kwargs.update(prefetch_factor=prefetch_factor, persistent_workers=True)
+        return DataLoader(self, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers, **kwargs)
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import numpy as np
+from pathlib import Path
+
+class FrameCache:
+    def __init__(self, root='inputs/cache'):
+        """
+        Initialize a FrameCache object. Frames are keyed by a hash of the bars on screen and the
+        chart settings, and recorded in an on-disk manifest, so frames rendered by an earlier or
+        overlapping run are skipped instead of rendered again.
+
+        Args:
+            root (str, optional): The directory of the manifest. Defaults to 'inputs/cache'.
+        """
+        self._root = Path(root)
+        self._manifest_path = self._root / 'manifest.jsonl'
+        self._entries = {}
+        self._pending = []
+        self.hits = 0
+        self.misses = 0
+        if self._manifest_path.exists():
+            with open(self._manifest_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries[entry['key']] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(ohlc: np.ndarray, params: dict):
+        """
+        Creates the content key of a frame.
+
+        Args:
+            ohlc (np.ndarray): The open, high, low, close prices on screen.
+            params (dict): The chart settings that change the image (chart_type, barspacing, width, ...).
+
+        Returns:
+            str: The hex digest identifying the frame.
+        """
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode())
+        digest.update(np.ascontiguousarray(ohlc, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Looks up a frame.
+
+        Args:
+            key (str): The content key of the frame.
+
+        Returns:
+            dict or None: The manifest entry of the frame, None if it was never rendered.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def add(self, key: str, entry: dict):
+        """
+        Records a rendered frame.
+
+        Args:
+            key (str): The content key of the frame.
+            entry (dict): Where the frame was saved and the window it shows.
+        """
+        entry = dict(entry, key=key)
+        self._entries[key] = entry
+        self._pending.append(entry)
+
+    def flush(self):
+        """
+        Appends the recorded frames to the manifest.
+        """
+        if not self._pending:
+            return
+        self._root.mkdir(parents=True, exist_ok=True)
+        with open(self._manifest_path, 'a') as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry, default=str) + '\n')
+        self._pending = []
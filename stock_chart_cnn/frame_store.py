@@ -0,0 +1,115 @@
+import csv
+import io
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from PIL import Image
+
+class FrameStore:
+    INDEX_COLUMNS = ['id', 'ticker', 'bartime', 'start', 'end', 'timestamp']
+
+    def __init__(self, path: str, capacity=None, frame_shape=None):
+        """
+        Initialize a FrameStore object. Frames are appended into one preallocated, memory-mapped
+        uint8 array file of shape (capacity, height, width, channels) with a sidecar csv index,
+        instead of one image file per frame.
+
+        Args:
+            path (str): The path of the store, the frames are kept in '{path}.npy' and the index in '{path}_index.csv'.
+            capacity (int, optional): The number of frames to preallocate. Required when creating a new store.
+            frame_shape (tuple, optional): The (height, width, channels) of each frame. Required when creating a new store.
+        """
+        self._path = Path(path)
+        self._array_path = self._path.with_name(self._path.name + '.npy')
+        self._index_path = self._path.with_name(self._path.name + '_index.csv')
+        if self._array_path.exists():
+            # continue appending to an existing store
+            self._frames = np.load(self._array_path, mmap_mode='r+')
+            self._count = len(pd.read_csv(self._index_path)) if self._index_path.exists() else 0
+        else:
+            if capacity is None or frame_shape is None:
+                raise ValueError('capacity and frame_shape are required to create a new frame store')
+            self._array_path.parent.mkdir(parents=True, exist_ok=True)
+            self._frames = np.lib.format.open_memmap(self._array_path, mode='w+', dtype=np.uint8,
+                                                     shape=(capacity, *frame_shape))
+            self._count = 0
+        # index rows waiting to be flushed to the sidecar
+        self._pending = []
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def frame_shape(self):
+        return self._frames.shape[1:]
+
+    def _to_array(self, image):
+        """
+        Converts a captured image to a frame array.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+
+        Returns:
+            np.ndarray: The frame as a uint8 array.
+        """
+        if isinstance(image, (bytes, bytearray)):
+            mode = 'RGB' if self.frame_shape[-1] == 3 else 'RGBA'
+            image = np.asarray(Image.open(io.BytesIO(image)).convert(mode))
+        if image.shape != self.frame_shape:
+            raise ValueError(f'Frame shape {image.shape} does not match the store shape {self.frame_shape}')
+        return image
+
+    def write(self, image, info: dict):
+        """
+        Appends a frame to the store.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+            info (dict): The index values of the frame (id, ticker, bartime, start, end, timestamp).
+        """
+        if self._count >= len(self._frames):
+            raise IndexError(f'Frame store {self._path} is full ({len(self._frames)} frames)')
+        self._frames[self._count] = self._to_array(image)
+        self._pending.append([info.get(column) for column in self.INDEX_COLUMNS])
+        self._count += 1
+
+    def flush(self):
+        """
+        Flushes the written frames to disk and appends their rows to the index.
+        """
+        self._frames.flush()
+        if not self._pending:
+            return
+        write_header = not self._index_path.exists()
+        with open(self._index_path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(self.INDEX_COLUMNS)
+            writer.writerows(self._pending)
+        self._pending = []
+
+    def close(self):
+        """
+        Flushes the store and releases the memory map.
+        """
+        self.flush()
+        del self._frames
+
+    @staticmethod
+    def load(path: str):
+        """
+        Opens a store for reading. The frames are a read-only memory map, so slicing a batch
+        only reads those frames from disk.
+
+        Args:
+            path (str): The path the store was created with.
+
+        Returns:
+            tuple: The (N, height, width, channels) frames and the index as a DataFrame.
+        """
+        path = Path(path)
+        index = pd.read_csv(path.with_name(path.name + '_index.csv'))
+        frames = np.load(path.with_name(path.name + '.npy'), mmap_mode='r')
+        # drop the preallocated frames that were never written
+        return frames[:len(index)], index
@@ -0,0 +1,216 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from .metrics import Metrics
+from .postprocess import FORMAT_EXTENSIONS, sniff_format
+
+class AsyncFrameWriter:
+    def __init__(self, format='PNG', quality=95, workers=4, max_pending=256, fsync_every=256, metrics=None):
+        """
+        Initialize an AsyncFrameWriter object. Encodes and writes frames on a thread pool, so the render
+        loop only hands them over. At most max_pending frames wait to be written, the render loop blocks
+        when the writer falls behind and the time it waits is recorded. The files are fsynced in batches
+        rather than one by one.
+
+        Args:
+            format (str, optional): The encoding format (JPEG, PNG, WEBP), or RAW to write screenshots as they were
+                                    captured and arrays as .npy. Defaults to 'PNG'.
+            quality (int, optional): The encoding quality for lossy formats. Defaults to 95.
+            workers (int, optional): The number of encoding and writing threads. Defaults to 4.
+            max_pending (int, optional): The number of frames that can wait to be written. Defaults to 256.
+            fsync_every (int, optional): The number of files written between two fsync batches, None leaves
+                                            flushing to the operating system. Defaults to 256.
+            metrics (Metrics, optional): Records the encode, write, fsync and backpressure times. Defaults to a
+                                            new Metrics object.
+        """
+        self._format = format.upper()
+        if self._format != 'RAW' and self._format not in FORMAT_EXTENSIONS:
+            raise ValueError(f'Unsupported format: {format}')
+        self._quality = quality
+        self._fsync_every = fsync_every
+        self.metrics = metrics or Metrics()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        # files written since the last fsync batch
+        self._unsynced = []
+        self._futures = set()
+        self._error = None
+
+    @property
+    def signature(self):
+        """
+        The settings that change the output, part of the frame cache key.
+        """
+        return {'format': self._format, 'quality': self._quality}
+
+    def extension(self, image):
+        """
+        Returns the file extension a frame is written with.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+
+        Returns:
+            str: The extension without the dot.
+        """
+        if self._format != 'RAW':
+            return FORMAT_EXTENSIONS[self._format]
+        if isinstance(image, (bytes, bytearray)):
+            return FORMAT_EXTENSIONS.get(sniff_format(image), 'bin')
+        return 'npy'
+
+    def encode(self, image):
+        """
+        Encodes a frame, screenshots already in the output format are kept as they are.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+
+        Returns:
+            bytes: The encoded image data.
+        """
+        if isinstance(image, (bytes, bytearray)):
+            if self._format in ('RAW', sniff_format(image)):
+                return bytes(image)
+            image = Image.open(io.BytesIO(image))
+        elif self._format == 'RAW':
+            buffer = io.BytesIO()
+            np.save(buffer, image)
+            return buffer.getvalue()
+        else:
+            image = Image.fromarray(np.ascontiguousarray(image))
+        if self._format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format=self._format, quality=self._quality)
+        return buffer.getvalue()
+
+    def submit(self, path, image, encoder=None):
+        """
+        Queues a frame to be encoded and written, waiting while max_pending frames are queued.
+        The frame must not be modified afterwards.
+
+        Args:
+            path (str or Path): The file path of the frame.
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+            encoder (callable, optional): Encodes the frame instead of the writer format, ex:
+                                            FramePostprocessor.encode. Defaults to None.
+        """
+        self._raise_error()
+        if not self._slots.acquire(blocking=False):
+            # the writer is behind, the render loop waits for a free slot
+            self.metrics.count('backpressure_waits')
+            with self.metrics.timer('backpressure'):
+                self._slots.acquire()
+        future = self._pool.submit(self._write, Path(path), image, encoder)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        self.metrics.count('frames_queued')
+
+    def _done(self, future):
+        """
+        Frees the slot of a written frame and keeps its error, if any.
+        """
+        self._slots.release()
+        with self._lock:
+            if future not in self._futures:
+                # already collected by flush, along with its error
+                return
+            self._futures.discard(future)
+            if future.exception() is not None and self._error is None:
+                self._error = future.exception()
+
+    def _write(self, path: Path, image, encoder):
+        """
+        Encodes and writes a frame on a writer thread.
+        """
+        with self.metrics.timer('encode'):
+            data = encoder(image) if encoder is not None else self.encode(image)
+        with self.metrics.timer('disk_write'):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'wb') as out:
+                out.write(data)
+        self.metrics.count('bytes_written', len(data))
+        if self._fsync_every is None:
+            return
+        with self._lock:
+            self._unsynced.append(path)
+            if len(self._unsynced) < self._fsync_every:
+                return
+            batch, self._unsynced = self._unsynced, []
+        self._sync(batch)
+
+    def _sync(self, paths: list):
+        """
+        Fsyncs a batch of written files and their directories.
+
+        Args:
+            paths (list): The paths of the files.
+        """
+        if not paths:
+            return
+        with self.metrics.timer('fsync'):
+            for path in paths + sorted({path.parent for path in paths}):
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except OSError:
+                    # directories cannot be opened on every platform
+                    continue
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        self.metrics.count('fsync_batches')
+
+    def _raise_error(self):
+        """
+        Raises the first error of a writer thread in the caller.
+        """
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    @property
+    def pending(self):
+        """
+        The number of frames waiting to be written.
+        """
+        with self._lock:
+            return len(self._futures)
+
+    def flush(self):
+        """
+        Waits until every queued frame is written and synced.
+        """
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        with self._lock:
+            # wait can return before the done callbacks have run, so the errors are read from the futures here
+            self._futures.difference_update(futures)
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors and self._error is None:
+                self._error = errors[0]
+            batch, self._unsynced = self._unsynced, []
+        self._sync(batch)
+        self._raise_error()
+
+    def close(self):
+        """
+        Flushes the queued frames and stops the writer threads.
+        """
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
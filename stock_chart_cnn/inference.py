@@ -0,0 +1,371 @@
+import io
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from PIL import Image
+from .chart_renderer import ChartRenderer
+
+try:
+    import torch
+except ImportError:
+    # plain callables on numpy batches still work without torch
+    torch = None
+
+
+def load_model(path: str, threads=None):
+    """
+    Loads a trained model for inference, a TorchScript file or a pickled torch module.
+
+    Args:
+        path (str): The path of the saved model.
+        threads (int, optional): The number of threads torch uses for one batch. Defaults to the torch default.
+
+    Returns:
+        torch.nn.Module: The model in eval mode.
+    """
+    if torch is None:
+        raise ImportError('torch is required to load a saved model')
+    if threads is not None:
+        torch.set_num_threads(threads)
+    try:
+        model = torch.jit.load(path, map_location='cpu')
+    except RuntimeError:
+        # not a TorchScript archive
+        model = torch.load(path, map_location='cpu', weights_only=False)
+    return model.eval()
+
+
+class InferenceServer:
+    def __init__(self, model, frame_shape=(250, 250, 3), max_batch=32, max_wait=0.005, workers=4,
+                    renderer=None, postprocessor=None):
+        """
+        Initialize an InferenceServer object. Collects single frame requests into micro-batches, so
+        the model runs once per batch. A batch is run when max_batch requests are waiting or the
+        oldest has waited max_wait seconds. Requests are decoded or rendered on a thread pool and
+        copied into a preallocated input batch.
+
+        Args:
+            model (callable): A torch module or a function taking an (N, C, H, W) float32 batch scaled to [0, 1]
+                                and returning one output per frame.
+            frame_shape (tuple, optional): The (H, W, C) shape of the frames the model takes. Defaults to (250, 250, 3).
+            max_batch (int, optional): The largest batch run at once. Defaults to 32.
+            max_wait (float, optional): The seconds a request waits for others to join its batch. Defaults to 0.005.
+            workers (int, optional): The number of threads decoding and rendering requests. Defaults to 4.
+            renderer (ChartRenderer, optional): Renders candle windows, it must draw frames of frame_shape after
+                                                the crop of the postprocessor. Defaults to a candle renderer
+                                                drawing frames of that size.
+            postprocessor (FramePostprocessor, optional): Crops the decoded or rendered frames, as done for the
+                                                            training data. Defaults to None.
+        """
+        self._model = model
+        self._frame_shape = tuple(frame_shape)
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        if renderer is None:
+            # rendered frames are cropped before they are checked against the model input
+            height, width = (postprocessor.uncropped_shape(frame_shape) if postprocessor is not None
+                             else frame_shape)[:2]
+            renderer = ChartRenderer(chart_width=width, chart_height=height)
+        self._renderer = renderer
+        self._postprocessor = postprocessor
+        height, width, channels = self._frame_shape
+        # filled in place for every batch, the torch tensor shares its memory
+        self._batch = np.empty((max_batch, channels, height, width), dtype=np.float32)
+        self._tensor = torch.from_numpy(self._batch) if torch is not None else None
+        self._workers = workers
+        self._pool = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=10_000)
+        self._batch_sizes = deque(maxlen=10_000)
+        self._requests = 0
+        self._started = None
+
+    def _prepare(self, image=None, candles=None):
+        """
+        Converts a request to an (H, W, C) uint8 frame.
+
+        Args:
+            image (bytes or np.ndarray, optional): An encoded screenshot, as captured by ChartImage, or a frame.
+            candles (np.ndarray or pd.DataFrame, optional): The window of bars to render.
+
+        Returns:
+            np.ndarray: The frame.
+        """
+        if candles is not None:
+            frame = self._renderer.render(candles)
+        elif isinstance(image, (bytes, bytearray)):
+            frame = np.asarray(Image.open(io.BytesIO(image)).convert('RGB'))
+        elif image is not None:
+            frame = np.asarray(image)
+        else:
+            raise ValueError('A request needs an image or candles')
+        if self._postprocessor is not None:
+            frame = self._postprocessor.crop(frame)
+        if frame.shape != self._frame_shape:
+            raise ValueError(f'Frame shape {frame.shape} does not match the model input {self._frame_shape}')
+        return frame
+
+    def submit(self, image=None, candles=None):
+        """
+        Queues a request for the next batch.
+
+        Args:
+            image (bytes or np.ndarray, optional): An encoded screenshot, as captured by ChartImage, or a frame.
+            candles (np.ndarray or pd.DataFrame, optional): The window of bars to render, an (N, 4) array of open,
+                                                            high, low, close prices or a DataFrame with those columns.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the model output of the frame.
+        """
+        self.start()
+        future = Future()
+        received = time.perf_counter()
+
+        def prepare():
+            try:
+                frame = self._prepare(image, candles)
+            except Exception as error:
+                future.set_exception(error)
+                return
+            self._queue.put((frame, future, received))
+
+        self._pool.submit(prepare)
+        return future
+
+    def predict(self, image=None, candles=None, timeout=None):
+        """
+        Scores one frame, waiting for its batch to run.
+
+        Args:
+            image (bytes or np.ndarray, optional): An encoded screenshot or a frame.
+            candles (np.ndarray or pd.DataFrame, optional): The window of bars to render.
+            timeout (float, optional): The seconds to wait for the result. Defaults to no limit.
+
+        Returns:
+            np.ndarray: The model output of the frame.
+        """
+        return self.submit(image, candles).result(timeout)
+
+    def _collect(self):
+        """
+        Waits for a request, then gathers more until the batch is full or the wait is over.
+
+        Returns:
+            list: The (frame, future, received) requests of the batch, empty when stopping.
+        """
+        first = self._queue.get()
+        if first is None:
+            return []
+        requests = [first]
+        deadline = time.perf_counter() + self._max_wait
+        while len(requests) < self._max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # finish this batch, then stop
+                self._queue.put(None)
+                break
+            requests.append(request)
+        return requests
+
+    def _run_model(self, size: int):
+        """
+        Runs the model on the first rows of the input batch.
+
+        Args:
+            size (int): The number of frames in the batch.
+
+        Returns:
+            np.ndarray: The outputs of the frames.
+        """
+        if torch is not None and isinstance(self._model, torch.nn.Module):
+            with torch.inference_mode():
+                return self._model(self._tensor[:size]).numpy()
+        return np.asarray(self._model(self._batch[:size]))
+
+    def _serve(self):
+        """
+        Runs batches until the server is stopped.
+        """
+        while True:
+            requests = self._collect()
+            if not requests:
+                return
+            size = len(requests)
+            for i, (frame, _, _) in enumerate(requests):
+                # (H, W, C) uint8 to (C, H, W) float in [0, 1]
+                np.multiply(frame.transpose(2, 0, 1), 1 / 255, out=self._batch[i], casting='unsafe')
+            try:
+                outputs = self._run_model(size)
+            except Exception as error:
+                for _, future, _ in requests:
+                    future.set_exception(error)
+                continue
+            done = time.perf_counter()
+            with self._lock:
+                self._batch_sizes.append(size)
+                for _, _, received in requests:
+                    self._latencies.append(done - received)
+                    self._requests += 1
+            for i, (_, future, _) in enumerate(requests):
+                future.set_result(outputs[i].copy())
+
+    def metrics(self):
+        """
+        Summarises the requests served so far.
+
+        Returns:
+            dict: The number of requests and batches, the mean batch size, the throughput in requests per second
+                    and the p50, p95 and p99 latency in milliseconds from submit to result.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            sizes = np.array(self._batch_sizes)
+            requests = self._requests
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        report = {'requests': requests, 'batches': len(sizes),
+                  'mean_batch_size': float(sizes.mean()) if len(sizes) else 0.0,
+                  'requests_per_sec': requests / elapsed if elapsed else 0.0}
+        for q in (50, 95, 99):
+            report[f'p{q}_ms'] = float(np.percentile(latencies, q)) if len(latencies) else 0.0
+        return report
+
+    def start(self):
+        """
+        Starts the batching thread, if it is not running yet.
+
+        Returns:
+            InferenceServer: The started server.
+        """
+        with self._lock:
+            if self._running:
+                return self
+            self._running = True
+            self._started = time.perf_counter()
+            self._pool = ThreadPoolExecutor(max_workers=self._workers)
+            self._thread = threading.Thread(target=self._serve, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Runs the requests already queued, then stops the batching thread.
+        """
+        if self._running:
+            self._pool.shutdown(wait=True)
+            self._queue.put(None)
+            self._thread.join()
+            self._running = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class InferenceHTTPServer:
+    def __init__(self, server: InferenceServer, host='127.0.0.1', port=0):
+        """
+        Initialize an InferenceHTTPServer object. A local HTTP front end of an InferenceServer:
+        POST /predict takes an encoded image, or JSON {"candles": [[open, high, low, close], ...]},
+        and returns {"output": [...]}; GET /metrics returns the server metrics.
+
+        Args:
+            server (InferenceServer): The server running the batches.
+            host (str, optional): The address to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): The port to listen on, 0 picks a free port. Defaults to 0.
+        """
+        self._server = server
+        self._http = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._http.server_address[:2]
+        return 'http://{h}:{p}'.format(h=host, p=port)
+
+    def _make_handler(self):
+        """
+        Creates the request handler class bound to this server.
+
+        Returns:
+            type: The handler class.
+        """
+        server = self._server
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == '/metrics':
+                    self._send(200, server.metrics())
+                else:
+                    self._send(404, {'message': 'not found'})
+
+            def do_POST(self):
+                if self.path != '/predict':
+                    self._send(404, {'message': 'not found'})
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                try:
+                    if self.headers.get('Content-Type', '').startswith('application/json'):
+                        candles = np.asarray(json.loads(body)['candles'], dtype=np.float64)
+                        output = server.predict(candles=candles)
+                    else:
+                        output = server.predict(image=body)
+                except (ValueError, KeyError, OSError) as error:
+                    self._send(400, {'message': str(error)})
+                    return
+                except Exception as error:
+                    # a model or batching failure, the client still gets a response instead of a dropped connection
+                    self._send(500, {'message': f'{type(error).__name__}: {error}'})
+                    return
+                self._send(200, {'output': np.asarray(output).tolist()})
+
+        return Handler
+
+    def start(self):
+        """
+        Starts serving on a background thread.
+
+        Returns:
+            InferenceHTTPServer: The started server.
+        """
+        self._server.start()
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the HTTP server, the InferenceServer is left running.
+        """
+        self._http.shutdown()
+        self._http.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from numpy.lib.stride_tricks import sliding_window_view
+
+# the direction of frames without horizon bars after them, apart from the 0 of a flat move
+NO_DIRECTION = -128
+
+def frame_windows(num_rows: int, num_bars_show: int, num_bar_gen: int, start=0):
+    """
+    Computes the window of every frame ChartImage.create_chart_images renders: the first
+    num_bars_show bars, then a frame every num_bar_gen new bars, and a last frame at the end
+    of the data if it falls between two steps.
+
+    Args:
+        num_rows (int): The number of rows in the data.
+        num_bars_show (int): The number of bars on screen.
+        num_bar_gen (int): The number of new bars between frames.
+        start (int, optional): The first row of the first frame. Defaults to 0.
+
+    Returns:
+        tuple: The start rows and the end rows (exclusive) of the frames as int64 arrays.
+    """
+    if num_rows <= start:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    ends = np.arange(start + num_bars_show, num_rows + 1, num_bar_gen, dtype=np.int64)
+    if len(ends) == 0 or ends[-1] != num_rows:
+        # the data ends between two steps, or is shorter than one screen
+        ends = np.append(ends, num_rows)
+    starts = np.maximum(ends - num_bars_show, start)
+    return starts, ends
+
+def align_windows(base_epoch: np.ndarray, base_seconds: int, epoch: np.ndarray, seconds: int,
+                  base_ends: np.ndarray, num_bars_show: int):
+    """
+    Computes the windows of a larger bartime series that end at the same time as the frames of a base
+    series: the last num_bars_show bars closed when the last base bar of each frame closes, so no
+    frame shows a bar that is still being built.
+
+    Args:
+        base_epoch (np.ndarray): The open times of the base bars in epoch seconds.
+        base_seconds (int): The length of a base bar in seconds.
+        epoch (np.ndarray): The open times of the larger bars in epoch seconds.
+        seconds (int): The length of a larger bar in seconds.
+        base_ends (np.ndarray): The end rows (exclusive) of the base frames.
+        num_bars_show (int): The number of bars on screen.
+
+    Returns:
+        tuple: The start rows and the end rows (exclusive) of the larger bartime windows as int64 arrays.
+    """
+    closes = base_epoch[base_ends - 1] + base_seconds
+    ends = np.searchsorted(epoch + seconds, closes, side='right').astype(np.int64)
+    starts = np.maximum(ends - num_bars_show, 0)
+    return starts, ends
+
+def plan_batches(num_rows: int, num_bars_show: int, num_bar_gen: int, frames_per_batch: int):
+    """
+    Partitions the frames of a whole series into batches that can be rendered independently. Each
+    batch covers its frames and the num_bars_show rows of lookback before its first new bar, so
+    rendering the rows of every batch gives the frames of frame_windows over the whole series,
+    including the ones straddling batch boundaries.
+
+    Args:
+        num_rows (int): The number of rows in the series.
+        num_bars_show (int): The number of bars on screen.
+        num_bar_gen (int): The number of new bars between frames, the stride of the windows.
+        frames_per_batch (int): The number of frames in each batch.
+
+    Returns:
+        list: The batches as (start row, end row, first frame) tuples, the first frame being the
+                index of the batch's first frame in the series, and the image_id it continues from.
+    """
+    starts, ends = frame_windows(num_rows, num_bars_show, num_bar_gen)
+    batches = []
+    for first in range(0, len(ends), frames_per_batch):
+        last = min(first + frames_per_batch, len(ends)) - 1
+        batches.append((int(starts[first]), int(ends[last]), first))
+    return batches
+
+def forward_targets(candles: pd.DataFrame, ends: np.ndarray, horizon: int):
+    """
+    Computes the targets after each frame in one strided pass over the series. Frames without
+    horizon bars after them get NaN targets and the NO_DIRECTION direction, and are not valid.
+
+    Args:
+        candles (pd.DataFrame): The candles with columns high, low, close.
+        ends (np.ndarray): The end rows (exclusive) of the frames.
+        horizon (int): The number of bars after each frame to look at.
+
+    Returns:
+        dict: 'returns' (F, horizon) returns of the next closes relative to the last close on screen,
+                'direction' (F,) sign of the return at the horizon, 'high_excursion' and 'low_excursion' (F,)
+                the highest high and lowest low of the next bars relative to the last close on screen,
+                and 'valid' (F,) whether the frame has all horizon bars after it, so training can drop the others.
+    """
+    pad = np.full(horizon, np.nan)
+    closes = candles['close'].to_numpy(dtype=np.float64)
+    # row i of each view holds the horizon bars starting at row i
+    future_close = sliding_window_view(np.concatenate([closes, pad]), horizon)[ends]
+    future_high = sliding_window_view(np.concatenate([candles['high'].to_numpy(dtype=np.float64), pad]), horizon)[ends]
+    future_low = sliding_window_view(np.concatenate([candles['low'].to_numpy(dtype=np.float64), pad]), horizon)[ends]
+    last_close = closes[ends - 1][:, None]
+
+    returns = future_close / last_close - 1
+    with np.errstate(invalid='ignore'):
+        high_excursion = np.max(future_high, axis=1) / last_close[:, 0] - 1
+        low_excursion = np.min(future_low, axis=1) / last_close[:, 0] - 1
+    valid = ~np.isnan(returns).any(axis=1)
+    direction = np.where(valid, np.sign(np.nan_to_num(returns[:, -1])), NO_DIRECTION).astype(np.int8)
+    return {'returns': returns.astype(np.float32), 'direction': direction,
+            'high_excursion': high_excursion.astype(np.float32), 'low_excursion': low_excursion.astype(np.float32),
+            'valid': valid}
+
+def compute_labels(candles: pd.DataFrame, num_bars_show: int, num_bar_gen: int, horizon=5, first_id=0, start=0):
+    """
+    Computes the windows and targets of every frame of a series.
+
+    Args:
+        candles (pd.DataFrame): The candles with columns high, low, close.
+        num_bars_show (int): The number of bars on screen.
+        num_bar_gen (int): The number of new bars between frames.
+        horizon (int, optional): The number of bars after each frame to look at. Defaults to 5.
+        first_id (int, optional): The image id the frames are numbered after, as passed to
+                                    create_chart_images. Defaults to 0.
+        start (int, optional): The first row of the first frame. Defaults to 0.
+
+    Returns:
+        dict: The frame 'id', 'start' and 'end' rows and the targets from forward_targets.
+    """
+    starts, ends = frame_windows(len(candles), num_bars_show, num_bar_gen, start)
+    labels = {'id': first_id + 1 + np.arange(len(ends), dtype=np.int64), 'start': starts, 'end': ends}
+    labels.update(forward_targets(candles, ends, horizon))
+    return labels
+
+def save_labels(filename: str, labels: dict):
+    """
+    Saves the labels of a run as a single array file.
+
+    Args:
+        filename (str): The path of the .npz file.
+        labels (dict): The label arrays keyed by name.
+    """
+    filepath = Path(filename)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(filepath, **labels)
+
+def load_labels(filename: str):
+    """
+    Loads the labels saved by save_labels.
+
+    Args:
+        filename (str): The path of the .npz file.
+
+    Returns:
+        dict: The label arrays keyed by name.
+    """
+    with np.load(filename) as data:
+        return {name: data[name] for name in data.files}
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+class Metrics:
+    def __init__(self):
+        """
+        Initialize a Metrics object. Thread safe timers and counters shared by the stages of a run
+        (fetch, parse, resample, chart set/update/screenshot, postprocess, write), exported as JSON
+        lines or a Prometheus text file.
+        """
+        self._timings = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Times a block of code and adds it to the stage totals.
+
+        Args:
+            stage (str): The name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage: str, seconds: float, count=1):
+        """
+        Adds time measured elsewhere to a stage.
+
+        Args:
+            stage (str): The name of the stage.
+            seconds (float): The seconds spent.
+            count (int, optional): The number of calls the time covers. Defaults to 1.
+        """
+        with self._lock:
+            total, calls = self._timings.get(stage, (0.0, 0))
+            self._timings[stage] = (total + seconds, calls + count)
+
+    def count(self, name: str, value=1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The name of the counter, ex: requests.
+            value (int, optional): The amount added. Defaults to 1.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def timings(self):
+        """
+        Summarises the time spent in each stage.
+
+        Returns:
+            dict: The total seconds, number of calls and mean milliseconds per call of each stage.
+        """
+        with self._lock:
+            timings = dict(self._timings)
+        return {stage: {'seconds': total, 'count': count, 'mean_ms': 1000 * total / count}
+                for stage, (total, count) in timings.items()}
+
+    def report(self):
+        """
+        Summarises the timers and the counters.
+
+        Returns:
+            dict: The stage summaries under 'timers' and the counter values under 'counters'.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        return {'timers': self.timings(), 'counters': counters}
+
+    def merge(self, report: dict):
+        """
+        Adds a report from another Metrics object, ex: one returned by a worker process.
+
+        Args:
+            report (dict): The report returned by Metrics.report.
+        """
+        for stage, stats in report['timers'].items():
+            self.add_time(stage, stats['seconds'], stats['count'])
+        for name, value in report['counters'].items():
+            self.count(name, value)
+
+    def reset(self):
+        """
+        Clears every timer and counter.
+        """
+        with self._lock:
+            self._timings = {}
+            self._counters = {}
+
+    def write_jsonl(self, filename: str, **labels):
+        """
+        Appends the report as one JSON line.
+
+        Args:
+            filename (str): The path of the .jsonl file.
+            **labels: Values recorded with the report, ex: job='btcusd/1_hour/0-10055'.
+        """
+        filepath = Path(filename)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        record = dict(timestamp=time.time(), **labels, **self.report())
+        with open(filepath, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def write_prometheus(self, filename: str, prefix='stock_chart_cnn'):
+        """
+        Writes the report in the Prometheus text format, replacing the file in one step so a
+        node exporter never reads it half written.
+
+        Args:
+            filename (str): The path of the .prom file.
+            prefix (str, optional): The prefix of the metric names. Defaults to 'stock_chart_cnn'.
+        """
+        report = self.report()
+        lines = [f'# TYPE {prefix}_stage_seconds_total counter',
+                 f'# TYPE {prefix}_stage_calls_total counter']
+        for stage, stats in sorted(report['timers'].items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {stats["seconds"]}')
+            lines.append(f'{prefix}_stage_calls_total{{stage="{stage}"}} {stats["count"]}')
+        for name, value in sorted(report['counters'].items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+        filepath = Path(filename)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = filepath.with_suffix('.tmp')
+        with open(temp_file, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_file, filepath)
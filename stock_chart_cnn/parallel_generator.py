@@ -0,0 +1,283 @@
+import cProfile
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from tqdm import tqdm
+from .chart_image import ChartImage
+from .frame_writer import AsyncFrameWriter
+from .labels import compute_labels, plan_batches
+from .metrics import Metrics
+
+# chart generators kept alive in each worker process, keyed by (ticker, bartime)
+_worker_generators = {}
+# the warm chart session shared by every generator in a worker process
+_worker_session = None
+# the timers and counters of the job running in a worker process
+_worker_metrics = Metrics()
+# the threads writing the frame files of a worker process
+_worker_writer = None
+
+def _run_job(job: tuple, chart_kwargs: dict, csv_step: bool, timeframes=None, store=None, profile_file=None,
+             shard_dir=None, horizon=5, writer_kwargs=None):
+    """
+    Renders the images for one (ticker, bartime, batch) job inside a worker process.
+
+    Args:
+        job (tuple): The ticker, bartime, batch start row, batch end row and first frame of the batch.
+        chart_kwargs (dict): The keyword arguments passed to ChartImage.
+        csv_step (bool): Whether to save the csv of the data on screen for each image.
+        timeframes (list, optional): The larger bartimes derived from the series and rendered aligned with it.
+        store (CandleStore, optional): The store the series are memory-mapped from instead of parsing the csv.
+        profile_file (str, optional): Where the cProfile stats of the job are saved, not profiled if not provided.
+        shard_dir (str, optional): The directory the frames are packed into tar shards in, with their labels.
+        horizon (int, optional): The number of bars after each frame its labels look at. Defaults to 5.
+        writer_kwargs (dict, optional): The keyword arguments of the AsyncFrameWriter the frame files are written by.
+
+    Returns:
+        tuple: The job, the number of images saved and the metrics report of the job.
+    """
+    global _worker_session, _worker_writer
+    ticker, bartime, start, end, first_frame = job
+    _worker_metrics.reset()
+    profiler = None
+    if profile_file is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if writer_kwargs is not None and _worker_writer is None:
+        _worker_writer = AsyncFrameWriter(metrics=_worker_metrics, **writer_kwargs)
+    key = (ticker, bartime)
+    # the csv is only read once per series in each worker
+    if key not in _worker_generators:
+        if store is not None and store.exists(ticker, bartime):
+            filename = str(store.series_dir(ticker, bartime))
+        else:
+            filename = 'data/{p}/formatted/{t}/{t}_{b}_data_formatted.csv'.format(p=chart_kwargs['parentdir'],
+                                                                                   t=ticker, b=bartime)
+        _worker_generators[key] = ChartImage(filename=filename, ticker=ticker, bartime=bartime,
+                                             session=_worker_session, metrics=_worker_metrics,
+                                             writer=_worker_writer, **chart_kwargs)
+        # every job in this worker renders on the same chart
+        _worker_session = _worker_generators[key].session
+    chart_image_gen = _worker_generators[key]
+    writer = None
+    if shard_dir is not None:
+        # imported here, so the workers that write files never import torch for the shard dataset
+        from .shards import ShardWriter
+        # the shards of a job are named after it, so a rerun of the job replaces them
+        labels = compute_labels(chart_image_gen._df, chart_image_gen._num_bars_show, chart_image_gen._num_bar_gen,
+                                horizon=horizon)
+        writer = ShardWriter(shard_dir, '{t}_{b}_{f:09d}'.format(t=ticker, b=bartime, f=first_frame), labels=labels)
+        chart_image_gen.sink = writer
+    if timeframes:
+        # the larger bartimes are derived once per worker and cover the same frames as the batch
+        num_images = chart_image_gen.create_multi_timeframe_images(timeframes, csv_step=csv_step, start=start, end=end)
+    else:
+        # the batch rows include the lookback of its first frame, ids are the frame numbers in the series
+        num_images = chart_image_gen.create_chart_images(chart_image_gen._df.iloc[start:end], csv_step=csv_step,
+                                                         image_id=first_frame)
+    if writer is not None:
+        writer.close()
+        chart_image_gen.sink = None
+    if profiler is not None:
+        profiler.disable()
+        Path(profile_file).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(profile_file)
+    return job, num_images, _worker_metrics.report()
+
+
+class ParallelGenerator:
+    def __init__(self, tickers: list, bartimes: list, chart_kwargs: dict, processes=None,
+                    batch_size=10_000, state_file='inputs/generation_state.json', timeframes=None, store=None,
+                    metrics_file='inputs/generation_metrics.jsonl', prometheus_file=None, profile_dir=None,
+                    profile_every=10, shard_dir=None, horizon=5, writer_kwargs=None):
+        """
+        Initialize a ParallelGenerator object. Plans the frames of every (ticker, bartime) series,
+        splits them into batches and renders the batches across a pool of processes.
+
+        Args:
+            tickers (list): The tickers to generate images for.
+            bartimes (list): The bartimes to generate images for.
+            chart_kwargs (dict): The keyword arguments passed to ChartImage (chart_type, parentdir, barspacing, ...).
+            processes (int, optional): The number of worker processes. Defaults to the number of cores.
+            batch_size (int, optional): The number of new rows rendered by each job, rounded down to whole
+                                        frames. Defaults to 10,000.
+            state_file (str, optional): The file recording the finished jobs, so an interrupted run
+                                        can resume. Defaults to 'inputs/generation_state.json'.
+            timeframes (list, optional): Larger bartimes derived in memory from every series and rendered as
+                                            time-aligned frame sets, ex: ['4_hour'] with bartimes ['1_hour'].
+                                            Defaults to None.
+            store (CandleStore, optional): A columnar store the series are read from when present. Its files are
+                                            memory-mapped, so the workers share one copy through the page cache.
+                                            Defaults to None.
+            metrics_file (str, optional): The JSON lines file the stage timings and counters of every finished job are
+                                            appended to, None to skip it. Defaults to 'inputs/generation_metrics.jsonl'.
+            prometheus_file (str, optional): The Prometheus text file the totals of the run are written to after
+                                                every job, for a node exporter. Defaults to None.
+            profile_dir (str, optional): The directory cProfile stats are saved to, one file per profiled job.
+                                            Defaults to None, no profiling.
+            profile_every (int, optional): Profiles one job in this many. Defaults to 10.
+            shard_dir (str, optional): The directory the frames and their labels are packed into tar shards in,
+                                        see ShardWriter, instead of one file per frame. Defaults to None.
+            horizon (int, optional): The number of bars after each frame the shard labels look at. Defaults to 5.
+            writer_kwargs (dict, optional): The keyword arguments of the AsyncFrameWriter each worker writes its
+                                            frame files with, ex: {'format': 'JPEG', 'quality': 90}, so rendering
+                                            overlaps encoding and writing. Defaults to None, written in the
+                                            render loop.
+        """
+        self._tickers = tickers
+        self._bartimes = bartimes
+        self._chart_kwargs = chart_kwargs
+        self._processes = processes or os.cpu_count()
+        self._batch_size = batch_size
+        self._state_file = Path(state_file)
+        self._timeframes = timeframes
+        self._store = store
+        self._metrics_file = metrics_file
+        self._prometheus_file = prometheus_file
+        self._profile_dir = profile_dir
+        self._profile_every = profile_every
+        self._shard_dir = shard_dir
+        self._horizon = horizon
+        self._writer_kwargs = writer_kwargs
+        # the totals of every job finished by this run
+        self.metrics = Metrics()
+
+    @staticmethod
+    def _job_key(job: tuple):
+        """
+        Creates the key a job is stored under in the state file.
+
+        Args:
+            job (tuple): The ticker, bartime, batch start row, batch end row and first frame of the batch.
+
+        Returns:
+            str: The job key.
+        """
+        return '{t}/{b}/{s}-{e}'.format(t=job[0], b=job[1], s=job[2], e=job[3])
+
+    def _count_rows(self, ticker: str, bartime: str):
+        """
+        Counts the data rows in the formatted csv for a series without parsing it.
+
+        Args:
+            ticker (str): The name of the ticker.
+            bartime (str): The bartime of the series.
+
+        Returns:
+            int: The number of data rows.
+        """
+        if self._store is not None and self._store.exists(ticker, bartime):
+            return len(self._store.read(ticker, bartime)['date'])
+        filename = 'data/{p}/formatted/{t}/{t}_{b}_data_formatted.csv'.format(p=self._chart_kwargs['parentdir'],
+                                                                               t=ticker, b=bartime)
+        with open(filename, 'rb') as f:
+            # subtract the header
+            return sum(1 for _ in f) - 1
+
+    def jobs(self):
+        """
+        Lists every (ticker, bartime, batch) job of the run.
+
+        Returns:
+            list: The jobs as (ticker, bartime, start, end, first frame) tuples.
+        """
+        # ChartImage defaults when the settings are not given
+        num_bars_show = self._chart_kwargs.get('num_bars_show', 120)
+        num_bar_gen = self._chart_kwargs.get('num_bar_gen', 20)
+        frames_per_batch = max(1, self._batch_size // num_bar_gen)
+        jobs = []
+        for ticker in self._tickers:
+            for bartime in self._bartimes:
+                num_rows = self._count_rows(ticker, bartime)
+                for start, end, first_frame in plan_batches(num_rows, num_bars_show, num_bar_gen, frames_per_batch):
+                    jobs.append((ticker, bartime, start, end, first_frame))
+        return jobs
+
+    def load_state(self):
+        """
+        Reads the keys of the jobs finished by earlier runs.
+
+        Returns:
+            set: The finished job keys.
+        """
+        if not self._state_file.exists():
+            return set()
+        with open(self._state_file) as f:
+            return set(json.load(f)['done'])
+
+    def _save_state(self, done: set):
+        """
+        Writes the finished job keys, replacing the old state file in one step so a crash
+        never leaves it half written.
+
+        Args:
+            done (set): The finished job keys.
+        """
+        self._state_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self._state_file.with_suffix('.tmp')
+        with open(temp_file, 'w') as f:
+            json.dump({'done': sorted(done)}, f)
+        os.replace(temp_file, self._state_file)
+
+    def _record_metrics(self, job: tuple, num_images: int, report: dict):
+        """
+        Adds the metrics of a finished job to the run totals and exports them.
+
+        Args:
+            job (tuple): The finished job.
+            num_images (int): The number of images the job saved.
+            report (dict): The metrics report returned by the worker.
+        """
+        self.metrics.merge(report)
+        if self._metrics_file is not None:
+            job_metrics = Metrics()
+            job_metrics.merge(report)
+            job_metrics.write_jsonl(self._metrics_file, job=self._job_key(job), images=num_images)
+        if self._prometheus_file is not None:
+            self.metrics.write_prometheus(self._prometheus_file)
+
+    def _profile_file(self, index: int, job: tuple):
+        """
+        Picks the jobs that are profiled.
+
+        Args:
+            index (int): The position of the job in the run.
+            job (tuple): The ticker, bartime, batch start row, batch end row and first frame of the batch.
+
+        Returns:
+            str or None: The path of the job's cProfile stats, None if the job is not profiled.
+        """
+        if self._profile_dir is None or index % self._profile_every:
+            return None
+        return str(Path(self._profile_dir) / '{t}_{b}_{s}-{e}.prof'.format(t=job[0], b=job[1], s=job[2], e=job[3]))
+
+    def run(self, csv_step=False):
+        """
+        Renders every job not finished by an earlier run.
+
+        Args:
+            csv_step (bool, optional): Whether to save the csv of the data on screen for each image. Defaults to False.
+
+        Returns:
+            int: The number of images saved by this run.
+        """
+        done = self.load_state()
+        pending = [job for job in self.jobs() if self._job_key(job) not in done]
+        total_images = 0
+        with ProcessPoolExecutor(max_workers=self._processes) as executor:
+            futures = [executor.submit(_run_job, job, self._chart_kwargs, csv_step, timeframes=self._timeframes,
+                                       store=self._store, profile_file=self._profile_file(i, job),
+                                       shard_dir=self._shard_dir, horizon=self._horizon,
+                                       writer_kwargs=self._writer_kwargs)
+                       for i, job in enumerate(pending)]
+            progress = tqdm(as_completed(futures), total=len(futures), desc='Jobs: ')
+            for future in progress:
+                job, num_images, report = future.result()
+                total_images += num_images
+                # record the job so a restart skips it
+                done.add(self._job_key(job))
+                self._save_state(done)
+                self._record_metrics(job, num_images, report)
+                progress.set_postfix(images=total_images)
+        return total_images
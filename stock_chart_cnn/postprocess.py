@@ -0,0 +1,316 @@
+import io
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+# file extension written for each encoding format
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+def sniff_format(data: bytes):
+    """
+    Detects the format of encoded image data from its signature.
+
+    Args:
+        data (bytes): The encoded image data.
+
+    Returns:
+        str: The format (JPEG, PNG, WEBP), None if it is not recognised.
+    """
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'PNG'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'JPEG'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+def _as_batch(images: np.ndarray):
+    """
+    Adds a batch axis to a single (H, W, C) image.
+
+    Args:
+        images (np.ndarray): An image or a batch of images.
+
+    Returns:
+        tuple: The (N, H, W, C) batch and whether a single image was given.
+    """
+    single = images.ndim == 3
+    return (images[None] if single else images), single
+
+def apply_mask_v1(images: np.ndarray, rng=None):
+    """
+    Masks a random band on the right of each image, at minimum 10% and at most 33% of the width.
+
+    Args:
+        images (np.ndarray): An (H, W, C) image or (N, H, W, C) batch.
+        rng (np.random.Generator, optional): The random generator. Defaults to a new generator.
+
+    Returns:
+        np.ndarray: The masked copy of the images.
+    """
+    rng = rng or np.random.default_rng()
+    batch, single = _as_batch(images)
+    n, h, w, _ = batch.shape
+    widths = rng.integers(w // 10, w // 3, size=n)
+    # columns right of each image's cut are masked
+    mask = np.arange(w)[None, :] >= (w - widths)[:, None]
+    masked = np.where(mask[:, None, :, None], 0, batch).astype(batch.dtype)
+    return masked[0] if single else masked
+
+def apply_mask_v2(images: np.ndarray, size=6, n_squares=1, rng=None):
+    """
+    Masks squares at random positions in each image.
+
+    Args:
+        images (np.ndarray): An (H, W, C) image or (N, H, W, C) batch.
+        size (int, optional): The side of each square in pixels. Defaults to 6.
+        n_squares (int, optional): The number of squares per image. Defaults to 1.
+        rng (np.random.Generator, optional): The random generator. Defaults to a new generator.
+
+    Returns:
+        np.ndarray: The masked copy of the images.
+    """
+    rng = rng or np.random.default_rng()
+    batch, single = _as_batch(images)
+    n, h, w, _ = batch.shape
+    rows, cols = np.arange(h), np.arange(w)
+    mask = np.zeros((n, h, w), dtype=bool)
+    # one pass per square, each covering the whole batch
+    for _ in range(n_squares):
+        y = rng.integers(h, size=n)[:, None]
+        x = rng.integers(w, size=n)[:, None]
+        in_rows = (rows >= np.clip(y - size // 2, 0, h)) & (rows < np.clip(y + size // 2, 0, h))
+        in_cols = (cols >= np.clip(x - size // 2, 0, w)) & (cols < np.clip(x + size // 2, 0, w))
+        mask |= in_rows[:, :, None] & in_cols[:, None, :]
+    masked = np.where(mask[..., None], 0, batch).astype(batch.dtype)
+    return masked[0] if single else masked
+
+def apply_mask_seq(images: np.ndarray, fraction=1 / 11):
+    """
+    Masks the right part of each image, by default about the last 5 bars.
+
+    Args:
+        images (np.ndarray): An (H, W, C) image or (N, H, W, C) batch.
+        fraction (float, optional): The fraction of the width masked. Defaults to 1/11.
+
+    Returns:
+        np.ndarray: The masked copy of the images.
+    """
+    masked = images.copy()
+    w = images.shape[-2]
+    masked[..., w - int(w * fraction):, :] = 0
+    return masked
+
+
+class FramePostprocessor:
+    def __init__(self, crop=(0, 8, -70, -38), mode='RGB', masks=None, format='JPEG', quality=95, seed=None):
+        """
+        Initialize a FramePostprocessor object. Crops, converts and masks captured frames in memory,
+        so each frame is decoded once and every output is written once.
+
+        Args:
+            crop (tuple, optional): The (left, top, right, bottom) box to keep, negative values count from the
+                                    right and bottom edges. None keeps the whole frame. Defaults to the
+                                    lightweight_charts price and time axes being cut off.
+            mode (str, optional): The Pillow color mode of the output. Defaults to 'RGB'.
+            masks (dict, optional): The masked variants to create, name to a function taking a batch and a
+                                    random generator. Defaults to None.
+            format (str, optional): The encoding format (JPEG, PNG, WEBP). Defaults to 'JPEG'.
+            quality (int, optional): The encoding quality for lossy formats. Defaults to 95.
+            seed (int, optional): The seed of the random masks. Defaults to None.
+        """
+        self._crop = crop
+        self._mode = mode
+        self._masks = masks or {}
+        self._format = format.upper()
+        self._quality = quality
+        self._rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def default_masks(size=24, n_squares=20):
+        """
+        Creates the v1, v2 and seq masks used by the cleaning notebook.
+
+        Args:
+            size (int, optional): The side of the v2 squares. Defaults to 24.
+            n_squares (int, optional): The number of v2 squares. Defaults to 20.
+
+        Returns:
+            dict: The mask functions by name.
+        """
+        return {'v1': lambda images, rng: apply_mask_v1(images, rng=rng),
+                'v2': lambda images, rng: apply_mask_v2(images, size=size, n_squares=n_squares, rng=rng),
+                'seq': lambda images, rng: apply_mask_seq(images)}
+
+    @property
+    def signature(self):
+        """
+        The settings that change the output, part of the frame cache key.
+        """
+        return {'crop': self._crop, 'mode': self._mode, 'masks': sorted(self._masks),
+                'format': self._format, 'quality': self._quality}
+
+    @property
+    def extension(self):
+        return FORMAT_EXTENSIONS.get(self._format, self._format.lower())
+
+    def decode(self, image):
+        """
+        Decodes a captured frame and converts it to the output color mode.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+
+        Returns:
+            np.ndarray: The frame as a uint8 array.
+        """
+        if isinstance(image, (bytes, bytearray)):
+            return np.asarray(Image.open(io.BytesIO(image)).convert(self._mode))
+        if self._mode == 'RGB' and image.ndim == 3 and image.shape[-1] == 4:
+            # drop the alpha channel
+            return image[..., :3]
+        return image
+
+    def crop(self, images: np.ndarray):
+        """
+        Crops an image or a batch of images to the crop box, as a view without copying.
+
+        Args:
+            images (np.ndarray): An (H, W, C) image or (N, H, W, C) batch.
+
+        Returns:
+            np.ndarray: The cropped images.
+        """
+        if self._crop is None:
+            return images
+        left, top, right, bottom = self._crop
+        return images[..., top:bottom or None, left:right or None, :]
+
+    def uncropped_shape(self, shape: tuple):
+        """
+        Finds the shape of the frames that crop to a given shape, ex: the size to render at for a model input.
+
+        Args:
+            shape (tuple): The (H, W, C) shape after the crop.
+
+        Returns:
+            tuple: The (H, W, C) shape before the crop.
+        """
+        if self._crop is None:
+            return tuple(shape)
+        left, top, right, bottom = self._crop
+        height, width, *channels = shape
+        return (self._uncropped_size(top, bottom, height), self._uncropped_size(left, right, width), *channels)
+
+    @staticmethod
+    def _uncropped_size(start: int, stop: int, size: int):
+        """
+        Finds the length of an axis that the crop slice start:stop cuts to size.
+        """
+        start = start or 0
+        if start < 0:
+            raise ValueError(f'Cannot find the size before a crop starting from the far edge: {start}')
+        if not stop:
+            return start + size
+        if stop < 0:
+            return start + size - stop
+        if stop - start != size:
+            raise ValueError(f'The crop {start}:{stop} cannot give a size of {size}')
+        return stop
+
+    def process_batch(self, images: np.ndarray):
+        """
+        Crops a batch of frames and creates every masked variant.
+
+        Args:
+            images (np.ndarray): An (N, H, W, C) batch of decoded frames.
+
+        Returns:
+            dict: The cropped batch under 'cropped' and each masked batch under its mask name.
+        """
+        cropped = self.crop(images)
+        outputs = {'cropped': cropped}
+        for name, mask in self._masks.items():
+            outputs[name] = mask(cropped, self._rng)
+        return outputs
+
+    def process(self, image):
+        """
+        Decodes, crops and masks a single captured frame.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+
+        Returns:
+            dict: The cropped frame under 'cropped' and each masked frame under its mask name.
+        """
+        outputs = self.process_batch(self.decode(image)[None])
+        return {name: frames[0] for name, frames in outputs.items()}
+
+    def encode(self, image: np.ndarray):
+        """
+        Encodes a processed frame.
+
+        Args:
+            image (np.ndarray): The frame.
+
+        Returns:
+            bytes: The encoded image data.
+        """
+        buffer = io.BytesIO()
+        Image.fromarray(np.ascontiguousarray(image)).save(buffer, format=self._format, quality=self._quality)
+        return buffer.getvalue()
+
+    def output_paths(self, out_root: str, name: str):
+        """
+        Creates the file paths of every output of a frame. The cropped frame is the training target
+        in 'y_train', the masked variants the inputs in 'x_train/{mask}'.
+
+        Args:
+            out_root (str): The directory of the series, ex: inputs/clean/crypto/images/btcusd/candle/1_hour.
+            name (str): The file name of the frame without extension.
+
+        Returns:
+            dict: The path of each output by name.
+        """
+        out_root = Path(out_root)
+        filename = '{n}.{e}'.format(n=name, e=self.extension)
+        paths = {'cropped': out_root / 'y_train' / filename}
+        for mask_name in self._masks:
+            paths[mask_name] = out_root / 'x_train' / mask_name / filename
+        return paths
+
+    def write(self, outputs: dict, paths: dict):
+        """
+        Encodes and writes the outputs of a frame.
+
+        Args:
+            outputs (dict): The processed frames by name.
+            paths (dict): The file path of each output by name.
+        """
+        for name, frame in outputs.items():
+            paths[name].parent.mkdir(parents=True, exist_ok=True)
+            with open(paths[name], 'wb') as out:
+                out.write(self.encode(frame))
+
+    def clean_directory(self, src_dir: str, out_root: str, batch_size=256):
+        """
+        Processes a directory of raw screenshots in batches, replacing the cleaning notebook pass.
+
+        Args:
+            src_dir (str): The directory of raw screenshots.
+            out_root (str): The directory the outputs are written under.
+            batch_size (int, optional): The number of frames masked together. Defaults to 256.
+
+        Returns:
+            int: The number of frames processed.
+        """
+        files = sorted(p for p in Path(src_dir).iterdir() if p.is_file())
+        for i in range(0, len(files), batch_size):
+            batch_files = files[i:i + batch_size]
+            images = np.stack([self.decode(f.read_bytes()) for f in batch_files])
+            outputs = self.process_batch(images)
+            for j, f in enumerate(batch_files):
+                self.write({name: frames[j] for name, frames in outputs.items()},
+                           self.output_paths(out_root, f.stem))
+        return len(files)
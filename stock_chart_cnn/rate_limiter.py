@@ -0,0 +1,33 @@
+import threading
+import time
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float, burst=1):
+        """
+        Initialize a RateLimiter object. A token bucket shared by every thread making requests.
+
+        Args:
+            requests_per_second (float): The number of requests allowed per second.
+            burst (int, optional): The number of requests that may be made back to back. Defaults to 1.
+        """
+        self._rate = requests_per_second
+        self._capacity = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be made.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # refill the bucket for the time passed
+                self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# seconds in each bartime unit, bartimes have the form '{n}_{unit}' ex: 4_hour
+BARTIME_UNITS = {'min': 60, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def bartime_to_seconds(bartime: str):
+    """
+    Converts a bartime to its length in seconds.
+
+    Args:
+        bartime (str): The bartime, ex: 15_minute, 4_hour, 1_day.
+
+    Returns:
+        int: The length of one bar in seconds.
+    """
+    num, unit = bartime.split('_')
+    if unit not in BARTIME_UNITS:
+        raise ValueError(f'Unsupported bartime: {bartime}')
+    return int(num) * BARTIME_UNITS[unit]
+
+def dates_to_epoch(dates):
+    """
+    Converts UTC date strings ('%Y-%m-%d %H:%M:%S') or datetimes to epoch seconds.
+
+    Args:
+        dates (array-like): The dates to convert.
+
+    Returns:
+        np.ndarray: The dates as int64 epoch seconds.
+    """
+    dates = pd.to_datetime(pd.Series(np.asarray(dates)), format='%Y-%m-%d %H:%M:%S')
+    return dates.to_numpy().astype('datetime64[s]').astype(np.int64)
+
+def epoch_to_dates(epoch: np.ndarray):
+    """
+    Converts epoch seconds to the UTC date strings used by the formatted csv files.
+
+    Args:
+        epoch (np.ndarray): The epoch seconds.
+
+    Returns:
+        np.ndarray: The dates formatted as '%Y-%m-%d %H:%M:%S'.
+    """
+    return pd.to_datetime(epoch, unit='s').strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+
+def resample_candles(candles_df: pd.DataFrame, bartime: str, base_bartime=None, trim_partial=False):
+    """
+    Resamples candlestick data into a larger bartime. Every candle is assigned to the bucket
+    floor(epoch / bar seconds) and the buckets are reduced in one vectorized pass.
+
+    Args:
+        candles_df (pd.DataFrame): The candles with a 'date' column or index and columns low, high, open, close
+                                    and optionally volume.
+        bartime (str): The bartime to resample to, ex: 4_hour.
+        base_bartime (str, optional): The bartime of the input candles. Required when trim_partial is set.
+        trim_partial (bool, optional): Drops the first and last bucket when the candles do not cover them
+                                        completely, as happens at the edges of a fetched page. Defaults to False.
+
+    Returns:
+        pd.DataFrame: The resampled candles indexed by 'date' with columns ['low', 'high', 'open', 'close', 'volume'],
+                        volume only when the candles have it.
+    """
+    if 'date' in candles_df.columns:
+        candles_df = candles_df.set_index('date')
+    seconds = bartime_to_seconds(bartime)
+    epoch = dates_to_epoch(candles_df.index)
+    # sort by time, the api returns pages newest first
+    order = np.argsort(epoch, kind='stable')
+    epoch = epoch[order]
+    columns = {c: candles_df[c].to_numpy(dtype=np.float64)[order] for c in ['low', 'high', 'open', 'close', 'volume']
+               if c in candles_df.columns}
+    if len(epoch) == 0:
+        # an empty page, ex: a window before the listing of the ticker
+        return pd.DataFrame({c: [] for c in columns}, index=pd.Index([], name='date'))
+
+    buckets = epoch // seconds * seconds
+    # first row of every bucket
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)]
+    resampled = pd.DataFrame({
+        'date': epoch_to_dates(buckets[starts]),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'open': columns['open'][starts],
+        'close': columns['close'][ends - 1],
+    })
+    if 'volume' in columns:
+        resampled['volume'] = np.add.reduceat(columns['volume'], starts)
+
+    if trim_partial and len(resampled):
+        if base_bartime is None:
+            raise ValueError('base_bartime is required to trim partial buckets')
+        base_seconds = bartime_to_seconds(base_bartime)
+        keep = np.ones(len(resampled), dtype=bool)
+        # the first candle must open the bucket and the last candle must close it
+        keep[0] &= epoch[0] == buckets[0]
+        keep[-1] &= epoch[-1] == buckets[-1] + seconds - base_seconds
+        resampled = resampled[keep]
+
+    resampled.set_index('date', inplace=True)
+    return resampled
+
+def resample_csv(filename: str, bartime: str, out_filename=None):
+    """
+    Resamples a whole formatted csv file into a larger bartime.
+
+    Args:
+        filename (str): The path to the formatted csv, ex: data/crypto/formatted/btcusd/btcusd_1_hour_data_formatted.csv.
+        bartime (str): The bartime to resample to.
+        out_filename (str, optional): The path to save the resampled candles to. Not saved if not provided.
+
+    Returns:
+        pd.DataFrame: The resampled candles.
+    """
+    resampled = resample_candles(pd.read_csv(filename), bartime)
+    if out_filename is not None:
+        out_filename = Path(out_filename)
+        out_filename.parent.mkdir(parents=True, exist_ok=True)
+        resampled.to_csv(out_filename)
+    return resampled
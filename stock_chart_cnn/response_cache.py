@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+class ResponseCache:
+    def __init__(self, root='data/crypto/cache'):
+        """
+        Initialize a ResponseCache object. Stores the raw candle pages returned by the API, one file per
+        (product, granularity, start, end) request, so an interrupted download resumes from the pages
+        it already has.
+
+        Args:
+            root (str, optional): The directory of the cached pages. Defaults to 'data/crypto/cache'.
+        """
+        self._root = Path(root)
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, product: str, granularity: int, start: int, end: int):
+        """
+        Creates the file path of a cached page.
+
+        Args:
+            product (str): The product id, ex: BTC-USD.
+            granularity (int): The bartime in seconds.
+            start (int): The start timestamp of the request.
+            end (int): The end timestamp of the request.
+
+        Returns:
+            Path: The path of the page file.
+        """
+        return self._root / product / str(granularity) / '{s}_{e}.json'.format(s=start, e=end)
+
+    def get(self, product: str, granularity: int, start: int, end: int):
+        """
+        Reads a cached page.
+
+        Args:
+            product (str): The product id, ex: BTC-USD.
+            granularity (int): The bartime in seconds.
+            start (int): The start timestamp of the request.
+            end (int): The end timestamp of the request.
+
+        Returns:
+            list or None: The candles as returned by the API, or None if the page is not cached.
+        """
+        filepath = self.path(product, granularity, start, end)
+        if not filepath.exists():
+            self.misses += 1
+            return None
+        self.hits += 1
+        with open(filepath) as f:
+            return json.load(f)
+
+    def put(self, product: str, granularity: int, start: int, end: int, candles: list):
+        """
+        Writes a page, replacing the file in one step so a crash never leaves it half written.
+
+        Args:
+            product (str): The product id, ex: BTC-USD.
+            granularity (int): The bartime in seconds.
+            start (int): The start timestamp of the request.
+            end (int): The end timestamp of the request.
+            candles (list): The candles as returned by the API.
+        """
+        filepath = self.path(product, granularity, start, end)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        # a temporary file per process and thread, so concurrent writers never share one
+        temp_file = filepath.with_suffix('.{p}_{t}.tmp'.format(p=os.getpid(), t=threading.get_ident()))
+        with open(temp_file, 'w') as f:
+            json.dump(candles, f)
+        os.replace(temp_file, filepath)
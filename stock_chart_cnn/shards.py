@@ -0,0 +1,296 @@
+import io
+import json
+import os
+import random
+import tarfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from PIL import Image
+
+try:
+    import torch
+    from torch.utils.data import IterableDataset, get_worker_info
+except ImportError:
+    # the dataset still yields numpy arrays without torch
+    torch = None
+    IterableDataset = object
+    get_worker_info = lambda: None
+
+
+class ShardWriter:
+    INDEX_COLUMNS = ['shard', 'key', 'offset', 'size', 'id', 'ticker', 'bartime', 'start', 'end', 'timestamp']
+
+    def __init__(self, root: str, prefix: str, max_size=256 * 2**20, max_count=10_000, labels=None):
+        """
+        Initialize a ShardWriter object. Packs frames and their metadata into sequential tar shards in the
+        WebDataset layout, '{key}.png' followed by '{key}.json', instead of one file per frame. A shard is
+        written under a temporary name and renamed when it is full, with a sidecar index of the byte offset
+        of every frame, so readers only ever see complete shards. Writers with different prefixes, ex: one
+        per generator job, can write to the same directory at the same time.
+
+        Args:
+            root (str): The directory of the shards.
+            prefix (str): The start of the shard names, '{prefix}-{n:05d}.tar', unique to this writer.
+            max_size (int, optional): The bytes after which a shard is closed. Defaults to 256 MiB.
+            max_count (int, optional): The number of frames after which a shard is closed. Defaults to 10_000.
+            labels (dict, optional): The label arrays of the frames keyed by name, as returned by compute_labels.
+                                        The targets of each frame are looked up by its id and stored with its
+                                        metadata. Defaults to None.
+        """
+        self._root = Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._prefix = prefix
+        self._max_size = max_size
+        self._max_count = max_count
+        self._labels = labels
+        self._shard = 0
+        self._tar = None
+        self._path = None
+        self._index = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def _encode(image):
+        """
+        Encodes a frame to PNG bytes, screenshots already captured as PNG bytes are kept as they are.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+
+        Returns:
+            bytes: The PNG bytes.
+        """
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        buffer = io.BytesIO()
+        # a fast compression level, the shards are read far more often than they are written
+        Image.fromarray(np.asarray(image)).save(buffer, format='PNG', compress_level=1)
+        return buffer.getvalue()
+
+    def _targets(self, frame_id):
+        """
+        Looks up the label values of a frame.
+
+        Args:
+            frame_id (int): The id of the frame.
+
+        Returns:
+            dict: The targets of the frame, empty when it has no labels.
+        """
+        if self._labels is None or frame_id is None:
+            return {}
+        ids = self._labels['id']
+        row = int(np.searchsorted(ids, frame_id))
+        if row >= len(ids) or ids[row] != frame_id:
+            return {}
+        return {name: np.asarray(values[row]).tolist() for name, values in self._labels.items()
+                if name not in ('id', 'start', 'end')}
+
+    def _add(self, name: str, data: bytes):
+        """
+        Appends a member to the open shard.
+
+        Args:
+            name (str): The name of the member.
+            data (bytes): The content of the member.
+
+        Returns:
+            int: The byte offset of the content in the shard.
+        """
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self._tar.addfile(info, io.BytesIO(data))
+        # the content ends where the tar offset is, before its padding to a whole block
+        return self._tar.offset - tarfile.BLOCKSIZE * -(-len(data) // tarfile.BLOCKSIZE)
+
+    def write(self, image, info: dict):
+        """
+        Appends a frame and its metadata to the open shard, starting a new shard when it is full.
+
+        Args:
+            image (bytes or np.ndarray): The encoded screenshot or an already rendered array.
+            info (dict): The metadata of the frame (id, ticker, bartime, start, end, timestamp).
+        """
+        if self._tar is None:
+            self._path = self._root / '{p}-{n:05d}.tar'.format(p=self._prefix, n=self._shard)
+            self._tar = tarfile.open(self._path.with_name(self._path.name + '.tmp'), 'w', format=tarfile.USTAR_FORMAT)
+        key = '{t}_{b}_{id:09d}'.format(t=info.get('ticker'), b=info.get('bartime'), id=info.get('id', 0))
+        data = self._encode(image)
+        offset = self._add(key + '.png', data)
+        meta = {column: info.get(column) for column in self.INDEX_COLUMNS[4:]}
+        meta.update(self._targets(info.get('id')))
+        self._add(key + '.json', json.dumps(meta, default=str).encode())
+        self._index.append([self._path.name, key, offset, len(data)] + [info.get(c) for c in self.INDEX_COLUMNS[4:]])
+        self._count += 1
+        if self._tar.offset >= self._max_size or len(self._index) >= self._max_count:
+            self._close_shard()
+
+    def _close_shard(self):
+        """
+        Finishes the open shard, writes its index and makes it visible under its final name.
+        """
+        if self._tar is None:
+            return
+        self._tar.close()
+        os.replace(self._path.with_name(self._path.name + '.tmp'), self._path)
+        pd.DataFrame(self._index, columns=self.INDEX_COLUMNS).to_csv(self._path.with_suffix('.csv'), index=False)
+        self._tar = None
+        self._index = []
+        self._shard += 1
+
+    def flush(self):
+        """
+        Flushes the open shard to disk, it stays open for more frames.
+        """
+        if self._tar is not None:
+            self._tar.fileobj.flush()
+
+    def close(self):
+        """
+        Finishes the open shard.
+        """
+        self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def load_index(root: str):
+        """
+        Reads the index of every complete shard in a directory.
+
+        Args:
+            root (str): The directory of the shards.
+
+        Returns:
+            pd.DataFrame: One row per frame with its shard, key, byte offset and size, and metadata.
+        """
+        paths = sorted(Path(root).glob('*.csv'))
+        if not paths:
+            return pd.DataFrame(columns=ShardWriter.INDEX_COLUMNS)
+        return pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+
+
+class ShardDataset(IterableDataset):
+    def __init__(self, root: str, label_key='returns', shuffle_buffer=1000, shuffle_shards=True, seed=None,
+                    transform=None):
+        """
+        Initialize a ShardDataset object. Streams the frames of the shards written by ShardWriter, reading
+        each shard front to back, and shuffles them through a buffer so training gets a random order from
+        sequential reads. With a DataLoader the shards are split between its workers.
+
+        Args:
+            root (str): The directory of the shards.
+            label_key (str, optional): The metadata value used as the labels, None yields the whole metadata.
+                                        Defaults to 'returns'.
+            shuffle_buffer (int, optional): The number of frames a frame is drawn from, 0 keeps the shard order.
+                                            Defaults to 1000.
+            shuffle_shards (bool, optional): Whether to read the shards in a new random order every epoch.
+                                                Defaults to True.
+            seed (int, optional): The seed of the shuffles. Defaults to a random seed.
+            transform (callable, optional): Applied to each (H, W, C) frame after decoding, ex: a mask. Defaults to None.
+        """
+        self._shards = sorted(str(path) for path in Path(root).glob('*.tar'))
+        self._label_key = label_key
+        self._shuffle_buffer = shuffle_buffer
+        self._shuffle_shards = shuffle_shards
+        # the workers shuffle the shards the same way, so they split them without overlap
+        self._seed = random.randrange(2**32) if seed is None else seed
+        self._transform = transform
+        self._epoch = 0
+
+    @property
+    def shards(self):
+        return list(self._shards)
+
+    def set_epoch(self, epoch: int):
+        """
+        Sets the epoch the shuffles are seeded with, call it before each epoch for a new order.
+
+        Args:
+            epoch (int): The epoch number.
+        """
+        self._epoch = epoch
+
+    def _worker_shards(self):
+        """
+        Returns the shards read by this process, every DataLoader worker reads its own share.
+        """
+        shards = list(self._shards)
+        if self._shuffle_shards:
+            random.Random(f'{self._seed}-{self._epoch}').shuffle(shards)
+        worker = get_worker_info()
+        if worker is not None:
+            shards = shards[worker.id::worker.num_workers]
+        return shards
+
+    @staticmethod
+    def read_shard(path: str):
+        """
+        Reads a shard front to back.
+
+        Args:
+            path (str): The path of the shard.
+
+        Yields:
+            tuple: The key, the encoded frame and the metadata of each frame.
+        """
+        frame = None
+        # stream mode reads the tar sequentially without seeking
+        with tarfile.open(path, 'r|') as tar:
+            for member in tar:
+                key, extension = member.name.rsplit('.', 1)
+                data = tar.extractfile(member).read()
+                if extension == 'json':
+                    if frame is not None and frame[0] == key:
+                        yield key, frame[1], json.loads(data)
+                    frame = None
+                else:
+                    frame = (key, data)
+
+    def _sample(self, data: bytes, meta: dict):
+        """
+        Decodes a frame and picks its labels.
+
+        Returns:
+            tuple: The frame and labels, as a (3, H, W) float tensor in [0, 1] and a tensor when torch is
+                    installed, otherwise as numpy arrays.
+        """
+        frame = np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+        if self._transform is not None:
+            frame = self._transform(frame)
+        if self._label_key is None:
+            labels = meta
+        else:
+            labels = np.asarray(meta.get(self._label_key), dtype=np.float32)
+        if torch is None:
+            return frame, labels
+        image = torch.from_numpy(np.ascontiguousarray(frame)).permute(2, 0, 1).float().div_(255)
+        return image, labels if self._label_key is None else torch.from_numpy(labels)
+
+    def __iter__(self):
+        worker = get_worker_info()
+        rng = random.Random(f'{self._seed}-{self._epoch}-{0 if worker is None else worker.id}')
+        buffer = []
+        for shard in self._worker_shards():
+            for _, data, meta in self.read_shard(shard):
+                if self._shuffle_buffer <= 0:
+                    yield self._sample(data, meta)
+                    continue
+                if len(buffer) < self._shuffle_buffer:
+                    buffer.append((data, meta))
+                    continue
+                # swap the new frame in for a random one of the buffer
+                i = rng.randrange(len(buffer))
+                buffer[i], (data, meta) = (data, meta), buffer[i]
+                yield self._sample(data, meta)
+        rng.shuffle(buffer)
+        for data, meta in buffer:
+            yield self._sample(data, meta)
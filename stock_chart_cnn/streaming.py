@@ -0,0 +1,163 @@
+import io
+import time
+import numpy as np
+from PIL import Image
+from .candle_window import CandleWindow
+from .chart_image import ChartImage
+from .resample import bartime_to_seconds, dates_to_epoch
+
+class ReplaySource:
+    def __init__(self, filename: str, start=0, end=None, interval=0.0):
+        """
+        Initialize a ReplaySource object. Replays the bars of a formatted csv, or a CandleStore series
+        directory, as if they were closing live. A local stand-in for PollingSource.
+
+        Args:
+            filename (str): The path to the formatted csv or the CandleStore series directory.
+            start (int, optional): The first row replayed. Defaults to 0.
+            end (int, optional): The row the replay stops before. Defaults to the end of the data.
+            interval (float, optional): The seconds between two bars, 0 replays as fast as possible. Defaults to 0.
+        """
+        self._data = ChartImage.read_csv(filename).iloc[start:end]
+        self._interval = interval
+
+    def __iter__(self):
+        for _, bar in self._data.iterrows():
+            if self._interval:
+                time.sleep(self._interval)
+            yield bar
+
+
+class PollingSource:
+    def __init__(self, coinbase, ticker: str, bartime: str, history=0, poll_interval=5.0):
+        """
+        Initialize a PollingSource object. Polls the Coinbase candles endpoint and yields each bar once it
+        has closed.
+
+        Args:
+            coinbase (CoinbaseWrapper): The wrapper used to request the candles.
+            ticker (str): The ticker symbol for the cryptocurrency, expects form ex: btcusd.
+            bartime (str): The bartime interval for the candles.
+            history (int, optional): The number of closed bars yielded first, so a chart can be filled
+                                        without waiting for new bars. Defaults to 0.
+            poll_interval (float, optional): The seconds between two polls. Defaults to 5.
+        """
+        self._coinbase = coinbase
+        self._ticker = ticker
+        self._bartime = bartime
+        self._seconds = bartime_to_seconds(bartime)
+        self._history = history
+        self._poll_interval = poll_interval
+
+    def _last_closed(self):
+        """
+        Returns the start timestamp of the last closed bar.
+        """
+        return int(time.time()) // self._seconds * self._seconds - self._seconds
+
+    def __iter__(self):
+        # the bar before the first one yielded
+        last = self._last_closed() - self._history * self._seconds
+        while True:
+            closed = self._last_closed()
+            if closed > last:
+                bars = self._coinbase._fetch_range(self._ticker, self._bartime, last + self._seconds, closed, workers=1)
+                if bars is not None and not bars.empty:
+                    epoch = dates_to_epoch(bars.index)
+                    bars = bars[epoch > last].reset_index()
+                    for _, bar in bars.iterrows():
+                        yield bar
+                    last = int(epoch.max())
+            time.sleep(self._poll_interval)
+
+
+class ChartStream:
+    def __init__(self, chart_image: ChartImage, source):
+        """
+        Initialize a ChartStream object. Pushes the bars of a source into a CandleWindow of the last
+        num_bars_show bars and renders a frame every num_bar_gen bars on the warm chart of the ChartImage, updating
+        the chart one bar at a time instead of redrawing the window from a csv.
+
+        Args:
+            chart_image (ChartImage): Provides the chart settings, the session and the postprocessor.
+            source (iterable): Yields the closed bars as pd.Series with labels date, open, high, low, close,
+                                ex: ReplaySource or PollingSource.
+        """
+        self._chart_image = chart_image
+        self._source = source
+        self._num_bars_show = chart_image._num_bars_show
+        self._num_bar_gen = chart_image._num_bar_gen
+        self._window = CandleWindow(self._num_bars_show)
+        # a chart may keep every bar it is given, it is reset from the window to bound its memory
+        self._reset_every = 100 * self._num_bars_show
+
+    def _render(self, session):
+        """
+        Renders the chart to an RGB array, cropped when the ChartImage has a postprocessor.
+
+        Args:
+            session (ChartSession): The session holding the chart.
+
+        Returns:
+            np.ndarray: The frame.
+        """
+        if session.renders_arrays:
+            image = session.screenshot_array()
+        else:
+            image = np.asarray(Image.open(io.BytesIO(session.screenshot())).convert('RGB'))
+        postprocessor = self._chart_image._postprocessor
+        if postprocessor is not None:
+            image = postprocessor.process(image)['cropped']
+        return image
+
+    def frames(self):
+        """
+        Renders the frames as the bars arrive.
+
+        Yields:
+            tuple: The frame as an RGB array and the bars on screen as a pd.DataFrame.
+        """
+        session = self._chart_image.session
+        started = False
+        since_frame = 0
+        since_set = 0
+        for bar in self._source:
+            self._window.append(bar['date'], (bar['open'], bar['high'], bar['low'], bar['close']))
+            if len(self._window) < self._num_bars_show:
+                continue
+            with session.timer('stream'):
+                if not started or since_set >= self._reset_every:
+                    session.set(self._window.to_df())
+                    since_set = 0
+                else:
+                    session.update(bar)
+                    since_set += 1
+                # the first full window is rendered, then every num_bar_gen bars
+                if started:
+                    since_frame += 1
+                    if since_frame < self._num_bar_gen:
+                        continue
+                started = True
+                since_frame = 0
+                window = self._window.to_df()
+                image = self._render(session)
+            yield image, window
+
+    def run(self, on_frame, max_frames=None):
+        """
+        Renders the frames as the bars arrive and hands each one to a callback, ex: a model.
+
+        Args:
+            on_frame (callable): Called with the frame and the bars on screen.
+            max_frames (int, optional): The number of frames after which the stream stops. Defaults to no limit.
+
+        Returns:
+            int: The number of frames rendered.
+        """
+        count = 0
+        for image, window in self.frames():
+            on_frame(image, window)
+            count += 1
+            if max_frames is not None and count >= max_frames:
+                break
+        return count
@@ -0,0 +1,146 @@
+import json
+import random
+import threading
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .resample import dates_to_epoch
+
+# coinbase granularities and the bartime of the formatted csv serving them
+GRANULARITY_BARTIMES = {60: '1_min', 300: '5_minute', 900: '15_minute', 3600: '1_hour',
+                        21600: '6_hour', 86400: '1_day'}
+
+class StubCoinbaseServer:
+    def __init__(self, parentdir='crypto', port=0, error_rate=0.0, latency=0.0):
+        """
+        Initialize a StubCoinbaseServer object. A local stand-in for the Coinbase candles and spot
+        price endpoints that serves the formatted csv files, for benchmarks and offline runs.
+
+        Args:
+            parentdir (str, optional): The parent directory of the formatted data. Defaults to 'crypto'.
+            port (int, optional): The port to listen on, 0 picks a free port. Defaults to 0.
+            error_rate (float, optional): The fraction of requests answered with a 429. Defaults to 0.
+            latency (float, optional): The seconds each response is delayed by. Defaults to 0.
+        """
+        self._parentdir = parentdir
+        self._error_rate = error_rate
+        self._latency = latency
+        self._series = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{p}'.format(p=self._server.server_port)
+
+    def _load(self, ticker: str, bartime: str):
+        """
+        Loads a series once as epoch seconds and [low, high, open, close, volume] rows.
+
+        Args:
+            ticker (str): The ticker, ex: btcusd.
+            bartime (str): The bartime of the series.
+
+        Returns:
+            tuple: The sorted epoch array and the candle rows.
+        """
+        key = (ticker, bartime)
+        with self._lock:
+            if key not in self._series:
+                data = pd.read_csv('data/{p}/formatted/{t}/{t}_{b}_data_formatted.csv'.format(p=self._parentdir,
+                                                                                              t=ticker, b=bartime))
+                self._series[key] = (dates_to_epoch(data['date']),
+                                     data[['low', 'high', 'open', 'close', 'volume']].to_numpy())
+            return self._series[key]
+
+    def _candles(self, product: str, params: dict):
+        """
+        Creates the candles response for a request, newest first and at most 300 candles.
+
+        Args:
+            product (str): The product id, ex: BTC-USD.
+            params (dict): The query parameters.
+
+        Returns:
+            list or None: The candles, or None if the series does not exist.
+        """
+        granularity = int(params['granularity'][0])
+        start, end = int(params['start'][0]), int(params['end'][0])
+        ticker = product.lower().replace('-', '')
+        try:
+            epoch, rows = self._load(ticker, GRANULARITY_BARTIMES[granularity])
+        except (KeyError, FileNotFoundError):
+            return None
+        lo, hi = np.searchsorted(epoch, start, side='left'), np.searchsorted(epoch, end, side='right')
+        hi = min(hi, lo + 300)
+        return [[int(t), *row] for t, row in zip(epoch[lo:hi][::-1], rows[lo:hi][::-1].tolist())]
+
+    def _make_handler(self):
+        """
+        Creates the request handler class bound to this server.
+
+        Returns:
+            type: The handler class.
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub._latency:
+                    threading.Event().wait(stub._latency)
+                if random.random() < stub._error_rate:
+                    self._send(429, {'message': 'rate limited'})
+                    return
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                if len(parts) == 3 and parts[0] == 'products' and parts[2] == 'candles':
+                    candles = stub._candles(parts[1], parse_qs(url.query))
+                    self._send(404, {'message': 'not found'}) if candles is None else self._send(200, candles)
+                elif len(parts) == 4 and parts[:2] == ['v2', 'prices'] and parts[3] == 'spot':
+                    ticker = parts[2].lower().replace('-', '')
+                    _, rows = stub._load(ticker, '1_hour')
+                    self._send(200, {'data': {'amount': str(rows[-1][3])}})
+                else:
+                    self._send(404, {'message': 'not found'})
+
+        return Handler
+
+    def start(self):
+        """
+        Starts serving on a background thread.
+
+        Returns:
+            StubCoinbaseServer: The started server.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
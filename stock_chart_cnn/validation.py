@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from .resample import bartime_to_seconds, dates_to_epoch, epoch_to_dates
+
+def _dates(candles: pd.DataFrame):
+    """
+    Returns the dates of the candles, from the date column of a formatted csv or the date index of the api data.
+    """
+    return candles['date'] if 'date' in candles.columns else candles.index
+
+def validate_candles(candles: pd.DataFrame, bartime: str):
+    """
+    Checks a whole series in one vectorized pass: duplicated and out of order dates, missing
+    intervals, dates off the bartime grid, and prices that are not a valid candle.
+
+    Args:
+        candles (pd.DataFrame): The candles with a date column or index and columns open, high, low, close,
+                                and optionally volume.
+        bartime (str): The bartime of the series.
+
+    Returns:
+        dict: The number of 'rows', 'duplicates', 'out_of_order' rows, 'gaps' and 'missing_bars' in them,
+                'misaligned' dates, 'ohlc_errors' (low above the open or close, high below them),
+                'nonpositive' prices or negative volumes, 'nan_rows', the (first, last) missing epoch
+                of every gap in 'gap_ranges', and 'ok' when nothing was found.
+    """
+    seconds = bartime_to_seconds(bartime)
+    epoch = dates_to_epoch(_dates(candles))
+    out_of_order = int((np.diff(epoch) < 0).sum())
+    ordered = np.sort(epoch)
+    duplicated = np.concatenate([[False], np.diff(ordered) == 0])
+    unique = ordered[~duplicated]
+    steps = np.diff(unique)
+    gap_rows = np.flatnonzero(steps > seconds)
+    gap_ranges = list(zip((unique[gap_rows] + seconds).tolist(), (unique[gap_rows + 1] - seconds).tolist()))
+
+    ohlc = candles[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+    open_, high, low, close = ohlc.T
+    nan_rows = np.isnan(ohlc).any(axis=1)
+    body_low, body_high = np.minimum(open_, close), np.maximum(open_, close)
+    ohlc_errors = (low > body_low) | (high < body_high) | (low > high)
+    nonpositive = (ohlc <= 0).any(axis=1)
+    if 'volume' in candles.columns:
+        nonpositive |= candles['volume'].to_numpy(dtype=np.float64) < 0
+
+    report = {'rows': len(epoch), 'duplicates': int(duplicated.sum()), 'out_of_order': out_of_order,
+              'gaps': len(gap_rows), 'missing_bars': int((steps[gap_rows] // seconds - 1).sum()),
+              'misaligned': int((unique % seconds != 0).sum()), 'ohlc_errors': int(ohlc_errors.sum()),
+              'nonpositive': int(nonpositive.sum()), 'nan_rows': int(nan_rows.sum())}
+    report['ok'] = not any(report[name] for name in report if name != 'rows')
+    report['gap_ranges'] = gap_ranges
+    return report
+
+def repair_candles(candles: pd.DataFrame, bartime: str, ohlc='clip', fill=None):
+    """
+    Repairs what can be repaired without refetching: sorts the series, drops duplicated dates and rows
+    without prices, fixes or drops invalid candles, and optionally fills the missing intervals.
+
+    Args:
+        candles (pd.DataFrame): The candles with a date column or index and columns open, high, low, close,
+                                and optionally volume.
+        bartime (str): The bartime of the series.
+        ohlc (str, optional): What to do with invalid candles, 'clip' widens the high and low to the open
+                                and close, 'drop' removes them and None keeps them. Defaults to 'clip'.
+        fill (str, optional): 'ffill' adds the missing bars as flat candles at the previous close with no
+                                volume, flagged in a 'filled' column. Defaults to None, the gaps are kept.
+
+    Returns:
+        pd.DataFrame: The repaired candles, with the date as a column or the index as given.
+    """
+    if ohlc not in ('clip', 'drop', None):
+        raise ValueError(f'Unsupported ohlc repair: {ohlc}')
+    if fill not in ('ffill', None):
+        raise ValueError(f'Unsupported fill: {fill}')
+    seconds = bartime_to_seconds(bartime)
+    indexed = 'date' not in candles.columns
+    df = candles.reset_index() if indexed else candles.reset_index(drop=True)
+    epoch = dates_to_epoch(df['date'])
+    # the first of every date is kept, in date order
+    order = np.argsort(epoch, kind='stable')
+    df, epoch = df.iloc[order], epoch[order]
+    keep = np.concatenate([[True], np.diff(epoch) != 0])
+    keep &= df[['open', 'high', 'low', 'close']].notna().all(axis=1).to_numpy()
+    df, epoch = df[keep].reset_index(drop=True), epoch[keep]
+
+    if ohlc is not None:
+        prices = df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+        if ohlc == 'clip':
+            df['high'] = prices.max(axis=1)
+            df['low'] = prices.min(axis=1)
+        else:
+            invalid = (prices[:, 2] > np.minimum(prices[:, 0], prices[:, 3])) | \
+                      (prices[:, 1] < np.maximum(prices[:, 0], prices[:, 3])) | (prices[:, 2] > prices[:, 1])
+            df, epoch = df[~invalid].reset_index(drop=True), epoch[~invalid]
+
+    if fill is not None and len(epoch):
+        grid = np.arange(epoch[0], epoch[-1] + 1, seconds, dtype=np.int64)
+        missing = np.setdiff1d(grid, epoch, assume_unique=True)
+        # the close of the last real bar before each missing one
+        previous = df['close'].to_numpy(dtype=np.float64)[np.searchsorted(epoch, missing, side='right') - 1]
+        filled = pd.DataFrame({'date': epoch_to_dates(missing),
+                               'open': previous, 'high': previous, 'low': previous, 'close': previous})
+        if 'volume' in df.columns:
+            filled['volume'] = 0.0
+        filled['filled'] = True
+        if 'filled' not in df.columns:
+            df['filled'] = False
+        df = pd.concat([df, filled[df.columns]], ignore_index=True)
+        df = df.iloc[np.argsort(np.concatenate([epoch, missing]), kind='stable')].reset_index(drop=True)
+    return df.set_index('date') if indexed else df
+
+def gapped_windows(epoch: np.ndarray, seconds: int, starts: np.ndarray, ends: np.ndarray):
+    """
+    Finds the frame windows whose bars on screen span a missing interval.
+
+    Args:
+        epoch (np.ndarray): The open times of the bars in epoch seconds.
+        seconds (int): The length of a bar in seconds.
+        starts (np.ndarray): The start rows of the windows.
+        ends (np.ndarray): The end rows (exclusive) of the windows.
+
+    Returns:
+        np.ndarray: A boolean mask of the windows with a gap.
+    """
+    # gaps before each row, a window has a gap if any row after its first follows one
+    gaps = np.concatenate([[0], np.cumsum(np.diff(epoch) != seconds)])
+    return gaps[ends - 1] != gaps[starts]
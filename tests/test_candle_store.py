@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from stock_chart_cnn.candle_store import CandleStore
+from stock_chart_cnn.resample import epoch_to_dates
+
+HOUR = 3600
+
+def candles(first: int, num: int):
+    close = 100 + np.arange(num, dtype=np.float64)
+    return pd.DataFrame({'date': epoch_to_dates(first + HOUR * np.arange(num)), 'low': close - 1,
+                         'high': close + 1, 'open': close, 'close': close, 'volume': np.ones(num)})
+
+def test_append_adds_rows_in_place(tmp_path):
+    store = CandleStore(tmp_path)
+    df = candles(1_700_006_400, 100)
+    store.write('btcusd', '1_hour', df.iloc[:80])
+    files = {}
+    for column in ['date', *CandleStore.COLUMNS]:
+        path = store.series_dir('btcusd', '1_hour') / f'{column}.npy'
+        files[column] = (path.stat().st_ino, path.stat().st_size)
+    store.append('btcusd', '1_hour', df.iloc[80:])
+    for column, (inode, size) in files.items():
+        path = store.series_dir('btcusd', '1_hour') / f'{column}.npy'
+        # the same file grown by 20 rows, not a rewritten one
+        assert path.stat().st_ino == inode
+        assert path.stat().st_size == size + 20 * 8
+    pd.testing.assert_frame_equal(store.read_df('btcusd', '1_hour', dates='str'), df)
+
+def test_append_merges_rows_inside_the_series(tmp_path):
+    store = CandleStore(tmp_path)
+    df = candles(1_700_006_400, 100)
+    store.write('btcusd', '1_hour', df.drop(index=[10, 11]))
+    # a filled hole and a row already stored
+    store.append('btcusd', '1_hour', df.iloc[[10, 11, 50]])
+    pd.testing.assert_frame_equal(store.read_df('btcusd', '1_hour', dates='str'), df)
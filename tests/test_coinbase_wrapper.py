@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stock_chart_cnn.candle_store import CandleStore
+from stock_chart_cnn.coinbase_wrapper import CoinbaseWrapper
+from stock_chart_cnn.resample import dates_to_epoch, epoch_to_dates, resample_candles
+from stock_chart_cnn.stub_server import StubCoinbaseServer
+
+HOUR = 3600
+FOUR_HOURS = 4 * HOUR
+# 60 days of 1 hour candles, starting on a 4 hour boundary
+FIRST = 1_700_000_000 // FOUR_HOURS * FOUR_HOURS
+NUM_HOURS = 24 * 60
+
+@pytest.fixture
+def hourly(tmp_path, monkeypatch):
+    """
+    Writes a continuous 1 hour series for the stub server and runs the test from its directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, NUM_HOURS))
+    open_ = np.r_[close[0], close[:-1]]
+    df = pd.DataFrame({'date': epoch_to_dates(FIRST + HOUR * np.arange(NUM_HOURS)),
+                       'low': np.minimum(open_, close) - 0.5, 'high': np.maximum(open_, close) + 0.5,
+                       'open': open_, 'close': close, 'volume': rng.uniform(1, 10, NUM_HOURS)})
+    path = tmp_path / 'data/stub/formatted/btcusd/btcusd_1_hour_data_formatted.csv'
+    path.parent.mkdir(parents=True)
+    df.to_csv(path, index=False)
+    return df
+
+@pytest.fixture
+def coinbase(hourly):
+    with StubCoinbaseServer(parentdir='stub') as stub:
+        yield CoinbaseWrapper(base_url=stub.url, requests_per_second=1000)
+
+def write_4hour(hourly: pd.DataFrame, drop: list):
+    """
+    Writes the stored 4 hour csv without the bars at the given positions.
+
+    Returns:
+        pd.DataFrame: The complete 4 hour series.
+    """
+    full = resample_candles(hourly, '4_hour').reset_index()
+    stored = full.drop(index=drop)
+    stored.to_csv(CoinbaseWrapper._filepath_maker('btcusd', '4_hour'), index=False)
+    return full
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_4hour_range_keeps_the_bar_opening_at_end(coinbase, workers):
+    end = FIRST + 400 * HOUR
+    df = coinbase.get_data_in_date_range('btcusd', '4_hour', FIRST, end, workers=workers)
+    assert dates_to_epoch(df.index).tolist() == list(range(FIRST, end + 1, FOUR_HOURS))
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_single_4hour_hole_is_filled(coinbase, hourly, workers):
+    full = write_4hour(hourly, drop=[50])
+    hole = int(dates_to_epoch(full['date'])[50])
+    assert len(coinbase._fetch_range('btcusd', '4_hour', hole, hole, workers=workers)) == 1
+
+    before, after = coinbase.repair('btcusd', '4_hour', workers=workers)
+    assert before['missing_bars'] == 1
+    assert after['ok']
+    repaired = pd.read_csv(CoinbaseWrapper._filepath_maker('btcusd', '4_hour'))
+    pd.testing.assert_frame_equal(repaired, full, check_dtype=False)
+
+def test_download_all_keeps_the_bar_opening_at_end(coinbase, hourly):
+    end = FIRST + 400 * HOUR
+    saved = coinbase.download_all(['btcusd'], ['1_hour', '4_hour'], FIRST, end, workers=4)
+    assert saved == {('btcusd', '1_hour'): 401, ('btcusd', '4_hour'): 101}
+
+def test_sync_seeds_an_empty_store_with_the_whole_series(hourly, tmp_path):
+    stored = hourly.iloc[:-24]
+    stored.to_csv(CoinbaseWrapper._filepath_maker('btcusd', '1_hour'), index=False)
+    store = CandleStore(tmp_path / 'store')
+    with StubCoinbaseServer(parentdir='stub') as stub:
+        coinbase = CoinbaseWrapper(base_url=stub.url, requests_per_second=1000, store=store)
+        end = int(dates_to_epoch(hourly['date'])[-1])
+        assert coinbase.sync('btcusd', '1_hour', end=end) == 24
+    df = store.read_df('btcusd', '1_hour', dates='str')
+    pd.testing.assert_frame_equal(df, hourly[df.columns], check_dtype=False)
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_sync_fills_the_4hour_tail_and_holes(coinbase, hourly, workers):
+    full = write_4hour(hourly, drop=[100, *range(len(hourly) // 4 - 10, len(hourly) // 4)])
+    end = int(dates_to_epoch(full['date'])[-1])
+    # a periodic refresh only fetches the tail, up to the newest complete bar
+    assert coinbase.sync('btcusd', '4_hour', end=end, workers=workers) == 10
+    assert coinbase.sync('btcusd', '4_hour', end=end, backfill=True, workers=workers) == 1
+    synced = pd.read_csv(CoinbaseWrapper._filepath_maker('btcusd', '4_hour'))
+    pd.testing.assert_frame_equal(synced, full, check_dtype=False)
+
+def test_4hour_hole_is_built_when_the_exchange_misses_its_first_hour(coinbase, hourly):
+    # the stub loads the series on the first request, so the source can still change
+    hourly = hourly.drop(index=4 * 50)
+    hourly.to_csv('data/stub/formatted/btcusd/btcusd_1_hour_data_formatted.csv', index=False)
+    full = write_4hour(hourly, drop=[50])
+
+    before, after = coinbase.repair('btcusd', '4_hour')
+    assert before['missing_bars'] == 1
+    assert after['ok']
+    repaired = pd.read_csv(CoinbaseWrapper._filepath_maker('btcusd', '4_hour'))
+    pd.testing.assert_frame_equal(repaired, full, check_dtype=False)
@@ -0,0 +1,16 @@
+import numpy as np
+from stock_chart_cnn.inference import InferenceServer
+from stock_chart_cnn.postprocess import FramePostprocessor
+
+def test_rendered_frames_are_cropped_to_the_model_input():
+    postprocessor = FramePostprocessor()
+    server = InferenceServer(lambda batch: batch.mean(axis=(1, 2, 3)), frame_shape=(200, 180, 3),
+                             postprocessor=postprocessor)
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(size=60))
+    candles = np.column_stack([close, close + 1, close - 1, close])
+    try:
+        output = server.predict(candles=candles, timeout=30)
+    finally:
+        server.stop()
+    assert np.isfinite(output)
+    assert postprocessor.crop(np.zeros(postprocessor.uncropped_shape((200, 180, 3)))).shape == (200, 180, 3)
@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+from stock_chart_cnn.labels import NO_DIRECTION, compute_labels
+
+def test_unlabeled_frames_are_apart_from_flat_moves():
+    # flat for the first frames, then rising
+    close = np.r_[np.full(30, 100.0), 100.0 + np.arange(1, 21)]
+    candles = pd.DataFrame({'high': close + 1, 'low': close - 1, 'close': close})
+    labels = compute_labels(candles, num_bars_show=10, num_bar_gen=5, horizon=5)
+
+    assert labels['direction'][0] == 0
+    assert labels['valid'][0]
+    # the last frames have fewer than horizon bars after them
+    assert labels['valid'].tolist() == [end + 5 <= len(close) for end in labels['end']]
+    assert (labels['direction'][~labels['valid']] == NO_DIRECTION).all()
+    assert (labels['direction'][labels['valid']] != NO_DIRECTION).all()